@@ -0,0 +1,315 @@
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+# Run without a window; must be set before pygame is imported
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import pygame
+from pygame.locals import *
+
+import paint
+import racer
+import snake
+
+# Default allowed slowdown before a result counts as a regression
+THRESHOLD = 0.20
+# Target wall time per timing sample
+SAMPLE_TIME = 0.05
+SAMPLES = 7
+
+BENCHMARKS = []
+
+
+def register(name, setup):
+    """Register a workload; setup() returns the zero-argument callable to time"""
+    BENCHMARKS.append((name, setup))
+
+
+def measure(fn, sample_time=SAMPLE_TIME, samples=SAMPLES):
+    """Time fn() and return per-call statistics in microseconds"""
+    # Calibrate the number of calls per sample
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= sample_time / 4 or loops >= 1 << 20:
+            break
+        loops *= 2
+    loops = max(1, int(loops * sample_time / max(elapsed, 1e-9)))
+
+    timings = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        timings.append((time.perf_counter() - start) / loops * 1e6)
+    return {
+        'median_us': statistics.median(timings),
+        'min_us': min(timings),
+        'loops': loops,
+    }
+
+
+# Racer
+
+def _racer_game(entities):
+    """Headless game holding a fixed number of stationary obstacles and coins"""
+    game = racer.Game(headless=True, seed=1)
+    rng = random.Random(2)
+    for i in range(entities):
+        pool, group = ((game.obstacle_pool, game.obstacles) if i % 2 else
+                       (game.coin_pool, game.coins))
+        sprite = pool.acquire(rng)
+        sprite.rect.y = rng.randrange(0, racer.SCREEN_HEIGHT - sprite.rect.height)
+        sprite.speed = 0  # keep the population constant between calls
+        group.add(sprite)
+        game.all_sprites.add(sprite)
+    # Park the car off the road so it never collides
+    game.car.rect.topleft = (0, 0)
+    return game
+
+
+def _racer_update(entities):
+    game = _racer_game(entities)
+    def run():
+        game.game_over = False
+        game.obstacle_timer = game.coin_timer = 0
+        game.update(racer.NO_INPUT)
+    return run
+
+
+def _racer_draw(entities):
+    game = _racer_game(entities)
+    game.draw()
+    return game.draw
+
+
+for _count in (10, 100, 1000):
+    register(f"racer.update[{_count}]", lambda count=_count: _racer_update(count))
+    register(f"racer.draw[{_count}]", lambda count=_count: _racer_draw(count))
+
+
+# Snake
+
+def _hamiltonian_cycle():
+    """Cells of a cycle visiting the whole grid once (GRID_HEIGHT must be even)"""
+    cycle = [(x, 0) for x in range(snake.GRID_WIDTH)]
+    for y in range(1, snake.GRID_HEIGHT):
+        xs = range(snake.GRID_WIDTH - 1, 0, -1) if y % 2 else range(1, snake.GRID_WIDTH)
+        cycle.extend((x, y) for x in xs)
+    cycle.extend((0, y) for y in range(snake.GRID_HEIGHT - 1, 0, -1))
+    return cycle
+
+
+def _snake_of_length(length):
+    """A snake lying along the Hamiltonian cycle plus the direction table to follow it"""
+    cycle = _hamiltonian_cycle()
+    s = snake.Snake()
+    body = [cycle[-i % len(cycle)] for i in range(length)]
+    s.set_body(body)
+    s.length = length
+    turns = {}
+    for i, cell in enumerate(cycle):
+        nx, ny = cycle[(i + 1) % len(cycle)]
+        dx = (nx - cell[0] + 1) % snake.GRID_WIDTH - 1
+        dy = (ny - cell[1] + 1) % snake.GRID_HEIGHT - 1
+        turns[cell] = (dx, dy)
+    return s, turns
+
+
+def _snake_update(length):
+    s, turns = _snake_of_length(length)
+    def run():
+        s.direction = turns[s.get_head_position()]
+        if s.update():
+            raise RuntimeError("benchmark snake collided")
+    return run
+
+
+def _food_randomize(length):
+    s, _ = _snake_of_length(length)
+    food = snake.Food(s.positions, random.Random(3), s.free_cells)
+    return lambda: food.randomize_position(s.positions, s.free_cells)
+
+
+def _autopilot():
+    """One autopilot decision plus the tick it drives, restarting on game over"""
+    rng = random.Random(5)
+    state = {}
+    def new_game():
+        s = snake.Snake()
+        state['game'] = (s, snake.Food(s.positions, rng, s.free_cells))
+    new_game()
+    pilot = snake.Autopilot()
+    def run():
+        s, food = state['game']
+        s.direction = pilot.choose(s, food)
+        if snake.step(s, food):
+            new_game()
+    return run
+
+
+def _camera(length, size=2000):
+    """View of a size x size board around a long snake, half of it on screen"""
+    s = snake.Snake(size, size)
+    s.set_body([((size // 2 - i) % size, size // 2) for i in range(length)])
+    s.length = length
+    food = snake.Food(s.positions, random.Random(6), s.free_cells, size, size)
+    renderer = snake.CameraRenderer(pygame.Surface((snake.WINDOW_WIDTH, snake.WINDOW_HEIGHT)))
+    return lambda: renderer.draw(s, food)
+
+
+def _draw_grid():
+    surface = pygame.Surface((snake.WINDOW_WIDTH, snake.WINDOW_HEIGHT))
+    return lambda: snake.draw_grid(surface)
+
+
+for _length in (10, 100, 800):
+    register(f"snake.update[{_length}]", lambda length=_length: _snake_update(length))
+for _length in (10, 100, 800, snake.GRID_WIDTH * snake.GRID_HEIGHT - 1):
+    register(f"snake.food[{_length}]", lambda length=_length: _food_randomize(length))
+register("snake.autopilot", _autopilot)
+for _length in (10, 1000):
+    register(f"snake.camera[2000x2000,{_length}]", lambda length=_length: _camera(length))
+register("snake.draw_grid", _draw_grid)
+
+
+# Paint
+
+def _paint_stroke(segment, motions=4):
+    """One frame of a pen stroke: motions mouse moves of up to segment pixels, then the flush"""
+    app = paint.PaintApp(headless=True)
+    rng = random.Random(4)
+    points = [(rng.randrange(paint.WINDOW_WIDTH), rng.randrange(60, paint.WINDOW_HEIGHT))]
+    for _ in range(256):
+        x, y = points[-1]
+        points.append((min(max(x + rng.randint(-segment, segment), 0), paint.WINDOW_WIDTH - 1),
+                       min(max(y + rng.randint(-segment, segment), 60), paint.WINDOW_HEIGHT - 1)))
+    app.handle_events([pygame.event.Event(MOUSEBUTTONDOWN, pos=points[0], button=1)])
+    frames = [[pygame.event.Event(MOUSEMOTION, pos=point) for point in points[i:i + motions]]
+              for i in range(1, len(points) - motions, motions)]
+    state = {'i': 0}
+    def run():
+        state['i'] = (state['i'] + 1) % len(frames)
+        app.handle_events(frames[state['i']])
+        app.flush_stroke()
+    return run
+
+
+def _paint_preview(mode):
+    app = paint.PaintApp(headless=True)
+    app.mode = mode
+    app.handle_events([pygame.event.Event(MOUSEBUTTONDOWN, pos=(100, 100), button=1)])
+    positions = [(100 + i * 5, 100 + i * 3) for i in range(100)]
+    state = {'i': 0}
+    def run():
+        state['i'] = (state['i'] + 1) % len(positions)
+        app.handle_events([pygame.event.Event(MOUSEMOTION, pos=positions[state['i']])])
+    return run
+
+
+def _paint_fill(size):
+    """Bucket fill of a size x size document crossed by lines, alternating two colors"""
+    app = paint.PaintApp(headless=True, document_size=(size, size))
+    app.mode = paint.FILL
+    rng = random.Random(6)
+    for _ in range(size // 16):
+        x, y = rng.randrange(size), rng.randrange(size)
+        app.canvas.line(paint.BLACK, (x, y), (x + rng.randint(-size // 4, size // 4), y + rng.randint(-size // 4, size // 4)), 3)
+    colors = [paint.RED, paint.BLUE]
+    def run():
+        colors.reverse()
+        app.color = colors[0]
+        app.fill((size // 2, size // 2))
+    return run
+
+
+def _paint_render(zoom_steps):
+    """Window view of a 16384x16384 document with scattered strokes"""
+    app = paint.PaintApp(headless=True, document_size=(16384, 16384))
+    rng = random.Random(5)
+    for _ in range(400):
+        x, y = rng.randrange(16384), rng.randrange(16384)
+        app.canvas.line(paint.BLACK, (x, y), (x + rng.randint(-300, 300), y + rng.randint(-300, 300)), 5)
+    app.view.offset = (8192 - paint.WINDOW_WIDTH // 2, 8192 - paint.WINDOW_HEIGHT // 2)
+    app.view.zoom_by(zoom_steps, (paint.WINDOW_WIDTH // 2, paint.WINDOW_HEIGHT // 2))
+    surface = pygame.Surface((paint.WINDOW_WIDTH, paint.WINDOW_HEIGHT))
+    return lambda: app.canvas.render(surface, app.view)
+
+
+for _segment in (4, 64):
+    register(f"paint.stroke[{_segment}px]", lambda segment=_segment: _paint_stroke(segment))
+register("paint.preview[rect]", lambda: _paint_preview(paint.RECTANGLE))
+register("paint.preview[circle]", lambda: _paint_preview(paint.CIRCLE))
+for _size in (800, 4096):
+    register(f"paint.fill[{_size}^2]", lambda size=_size: _paint_fill(size))
+for _steps in (0, -3):
+    register(f"paint.render[16384^2,zoom{_steps:+d}]", lambda steps=_steps: _paint_render(steps))
+
+
+def run_benchmarks(pattern=None, sample_time=SAMPLE_TIME, samples=SAMPLES):
+    """Run registered benchmarks whose name contains pattern"""
+    results = {}
+    for name, setup in BENCHMARKS:
+        if pattern and pattern not in name:
+            continue
+        results[name] = measure(setup(), sample_time, samples)
+        print(f"{name:<28} {results[name]['median_us']:>12.2f} us median "
+              f"{results[name]['min_us']:>12.2f} us best", flush=True)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Return (name, baseline_us, current_us) for results slower than threshold allows.
+
+    Best-of-samples times are compared, as they are the least sensitive to noise.
+    """
+    regressions = []
+    for name, result in results.items():
+        reference = baseline.get(name)
+        if reference and result['min_us'] > reference['min_us'] * (1 + threshold):
+            regressions.append((name, reference['min_us'], result['min_us']))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless benchmarks for racer, snake and paint")
+    parser.add_argument('-k', dest='pattern', help="only run benchmarks whose name contains this")
+    parser.add_argument('--save', metavar='PATH', help="write results as a JSON baseline")
+    parser.add_argument('--baseline', metavar='PATH', help="compare against a JSON baseline")
+    parser.add_argument('--threshold', type=float, default=THRESHOLD,
+                        help="allowed slowdown as a fraction of the baseline (default %(default)s)")
+    parser.add_argument('--sample-time', type=float, default=SAMPLE_TIME,
+                        help="seconds per timing sample (default %(default)s)")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.pattern, args.sample_time)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({'python': sys.version.split()[0], 'pygame': pygame.version.ver,
+                       'results': results}, f, indent=2, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.threshold)
+        for name, before, after in regressions:
+            print(f"REGRESSION {name}: {before:.2f} us -> {after:.2f} us "
+                  f"(+{(after / before - 1) * 100:.0f}%)")
+        if regressions:
+            return 1
+        print(f"no regressions beyond {args.threshold:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
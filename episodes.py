@@ -0,0 +1,272 @@
+import argparse
+import math
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+# Episodes never open a window; must be set before pygame is imported
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import racer
+import snake
+
+# Default cap on episode length (ticks)
+MAX_TICKS = 20000
+# Chunks kept in flight per worker, bounding memory for very long runs
+CHUNKS_IN_FLIGHT = 2
+
+
+class RunningStats:
+    """Streaming count/mean/variance/min/max (Welford)"""
+    __slots__ = ('count', 'mean', 'm2', 'min', 'max')
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    @property
+    def stdev(self):
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else 0.0
+
+    def as_dict(self):
+        return {'count': self.count, 'mean': self.mean, 'stdev': self.stdev,
+                'min': self.min, 'max': self.max}
+
+
+# Racer policies: (game, rng) -> racer.InputState
+
+def racer_idle(game, rng):
+    return racer.NO_INPUT
+
+
+def racer_random(game, rng):
+    return racer.InputState(rng.getrandbits(4))
+
+
+def racer_dodge(game, rng):
+    """Steer away from the nearest obstacle closing in on the car's lane"""
+    car = game.car.rect
+    threat = None
+    for obstacle in game.obstacles:
+        rect = obstacle.rect
+        if rect.bottom <= car.top and rect.right > car.left - 10 and rect.left < car.right + 10:
+            if threat is None or rect.bottom > threat.bottom:
+                threat = rect
+    if threat is None:
+        return racer.NO_INPUT
+    road_center = racer.SCREEN_WIDTH // 2
+    if threat.centerx > car.centerx or (threat.centerx == car.centerx and car.centerx < road_center):
+        return racer.InputState(racer.INPUT_LEFT)
+    return racer.InputState(racer.INPUT_RIGHT)
+
+
+# Snake policies: (snake, food, rng) -> direction
+
+def snake_random(s, food, rng):
+    """Keep going, turning at random now and then (never reversing)"""
+    if rng.random() < 0.1:
+        dx, dy = s.direction
+        return rng.choice([d for d in snake.DIRECTIONS if d != (-dx, -dy)])
+    return s.direction
+
+
+def snake_greedy(s, food, rng):
+    """Step toward the food along the torus, avoiding cells the body occupies"""
+    head_x, head_y = s.get_head_position()
+    best = None
+    for direction in snake.DIRECTIONS:
+        if direction == (-s.direction[0], -s.direction[1]):
+            continue
+        x = (head_x + direction[0]) % s.width
+        y = (head_y + direction[1]) % s.height
+        if s.occupied[y * s.width + x]:
+            continue
+        dx = abs(x - food.position[0])
+        dy = abs(y - food.position[1])
+        distance = min(dx, s.width - dx) + min(dy, s.height - dy)
+        if best is None or distance < best[0]:
+            best = (distance, direction)
+    return best[1] if best else s.direction
+
+
+_autopilot = None
+
+
+def snake_autopilot(s, food, rng):
+    """Path-search autopilot; one per worker, it searches afresh when handed a new snake"""
+    global _autopilot
+    if _autopilot is None:
+        _autopilot = snake.Autopilot()
+    return _autopilot.choose(s, food)
+
+
+RACER_POLICIES = {'idle': racer_idle, 'random': racer_random, 'dodge': racer_dodge}
+SNAKE_POLICIES = {'random': snake_random, 'greedy': snake_greedy, 'autopilot': snake_autopilot}
+
+
+def run_racer_chunk(seeds, policy='dodge', max_ticks=MAX_TICKS, params=None):
+    """Play one racer episode per seed in this worker; return per-episode results"""
+    choose = RACER_POLICIES[policy]
+    game = racer.Game(headless=True)
+    for name, value in (params or {}).items():
+        setattr(game, name, value)
+    results = []
+    for seed in seeds:
+        game.rng = random.Random(seed)
+        game.reset()
+        policy_rng = random.Random(~seed)
+        ticks = game.run_headless(max_ticks, lambda g: choose(g, policy_rng))
+        results.append({'score': game.score, 'coins': game.coins_collected,
+                        'ticks': ticks, 'survived': not game.game_over})
+    return results
+
+
+def run_snake_chunk(seeds, policy='greedy', max_ticks=MAX_TICKS, params=None):
+    """Play one snake episode per seed in this worker; return per-episode results"""
+    choose = SNAKE_POLICIES[policy]
+    results = []
+    for seed in seeds:
+        s = snake.Snake()
+        for name, value in (params or {}).items():
+            setattr(s, name, value)
+        food = snake.Food(s.positions, random.Random(seed), s.free_cells)
+        policy_rng = random.Random(~seed)
+        game_over = False
+        ticks = 0
+        while not game_over and ticks < max_ticks:
+            s.direction = choose(s, food, policy_rng)
+            game_over = snake.step(s, food)
+            ticks += 1
+        results.append({'score': s.score, 'length': s.length, 'level': s.level,
+                        'ticks': ticks, 'survived': not game_over})
+    return results
+
+
+RUNNERS = {'racer': run_racer_chunk, 'snake': run_snake_chunk}
+
+
+def run_episodes(game, episodes, workers=None, chunk_size=None, seed=0,
+                 policy=None, max_ticks=MAX_TICKS, params=None, progress=None):
+    """Fan episodes out across a process pool and aggregate results as they stream in.
+
+    Episode i uses seed + i, so results do not depend on the worker count or
+    chunking. Returns {metric: RunningStats}.
+    """
+    runner = RUNNERS[game]
+    workers = workers or os.cpu_count() or 1
+    if chunk_size is None:
+        # Large enough to amortize IPC, small enough to balance load
+        chunk_size = max(1, min(1000, episodes // (workers * 8)))
+    kwargs = {'max_ticks': max_ticks, 'params': params}
+    if policy:
+        kwargs['policy'] = policy
+
+    stats = {}
+    done = 0
+    next_start = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        while next_start < episodes or pending:
+            while next_start < episodes and len(pending) < workers * CHUNKS_IN_FLIGHT:
+                stop = min(next_start + chunk_size, episodes)
+                pending.add(pool.submit(runner, range(seed + next_start, seed + stop), **kwargs))
+                next_start = stop
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                for result in future.result():
+                    for metric, value in result.items():
+                        if metric not in stats:
+                            stats[metric] = RunningStats()
+                        stats[metric].add(value)
+                    done += 1
+            if progress:
+                progress(done, episodes)
+    return stats
+
+
+# Difficulty constants --set may override per game, and how many integers each takes;
+# two make an inclusive (low, high) range of ticks
+PARAMS = {
+    'racer': {'obstacle_interval': 2, 'coin_interval': 2},
+    'snake': {'foods_to_next_level': 1},
+}
+
+
+def _parse_params(pairs, allowed):
+    """Parse NAME=VALUE overrides of the constants in allowed (one of PARAMS).
+
+    Values are positive integers, comma-separated for a range whose low end
+    is not above its high end. Raises ValueError for unknown names or bad values.
+    """
+    params = {}
+    for pair in pairs:
+        name, _, value = pair.partition('=')
+        if name not in allowed:
+            raise ValueError(f"unknown parameter {name!r} in {pair!r}; choose from {', '.join(allowed)}")
+        try:
+            values = tuple(int(part) for part in value.split(','))
+        except ValueError:
+            raise ValueError(f"{pair!r}: values must be integers") from None
+        if len(values) != allowed[name]:
+            expected = 'one integer' if allowed[name] == 1 else 'a LOW,HIGH range'
+            raise ValueError(f"{name} takes {expected}, got {value!r}")
+        if min(values) < 1:
+            raise ValueError(f"{pair!r}: values must be positive")
+        if len(values) == 1:
+            values = values[0]
+        elif values[0] > values[1]:
+            raise ValueError(f"{pair!r}: the low end of the range is above the high end")
+        params[name] = values
+    return params
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run headless racer/snake episodes on a process pool")
+    parser.add_argument('game', choices=sorted(RUNNERS))
+    parser.add_argument('-n', '--episodes', type=int, default=1000)
+    parser.add_argument('-j', '--workers', type=int, help="worker processes (default: all cores)")
+    parser.add_argument('--chunk-size', type=int, help="episodes per task sent to a worker")
+    parser.add_argument('--seed', type=int, default=0, help="seed of the first episode")
+    parser.add_argument('--policy', help="racer: idle/random/dodge, snake: random/greedy/autopilot")
+    parser.add_argument('--max-ticks', type=int, default=MAX_TICKS)
+    parser.add_argument('--set', dest='params', action='append', default=[], metavar='NAME=VALUE',
+                        help="override a difficulty constant, e.g. obstacle_interval=30,60 "
+                             "or foods_to_next_level=5")
+    args = parser.parse_args(argv)
+    try:
+        params = _parse_params(args.params, PARAMS[args.game])
+    except ValueError as error:
+        parser.error(str(error))
+
+    start = time.perf_counter()
+    stats = run_episodes(args.game, args.episodes, args.workers, args.chunk_size, args.seed,
+                         args.policy, args.max_ticks, params)
+    elapsed = time.perf_counter() - start
+
+    print(f"{args.episodes} {args.game} episodes in {elapsed:.2f}s "
+          f"({args.episodes / elapsed:.0f} episodes/s)")
+    print(f"{'metric':<10} {'mean':>10} {'stdev':>10} {'min':>8} {'max':>8}")
+    for metric, values in stats.items():
+        print(f"{metric:<10} {values.mean:>10.2f} {values.stdev:>10.2f} "
+              f"{values.min:>8g} {values.max:>8g}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,200 @@
+import numpy as np
+import pygame
+
+# Side of the document window a fill can spread over, centred on the seed
+WINDOW = 4096
+
+
+def matching(surface, color, tolerance=0):
+    """Boolean [y, x] array of the pixels within tolerance of color in every channel"""
+    if tolerance == 0:
+        return pygame.surfarray.pixels2d(surface).T == surface.map_rgb(color)
+    pixels = pygame.surfarray.pixels3d(surface).transpose(1, 0, 2)
+    near = np.ones(pixels.shape[:2], bool)
+    for channel in range(3):
+        near &= np.abs(pixels[:, :, channel].astype(np.int16) - color[channel]) <= tolerance
+    return near
+
+
+def _row_cells(height, width):
+    """Zeroed int8 cells holding height rows of width, laid end to end with a 0 after each.
+
+    Returns the flat cells (with a leading 0) and a [y, x] boolean view of the
+    rows; the separators keep runs of True cells from crossing rows.
+    """
+    cells = np.zeros(height * (width + 1) + 1, np.int8)
+    return cells, cells[1:].reshape(height, width + 1)[:, :width].view(bool)
+
+
+def flood_mask(matches, seed):
+    """Cells of the 4-connected region of True cells in matches that contains seed.
+
+    Returns the region's bounding box (left, top, right, bottom; exclusive)
+    and the region as a boolean [y, x] array cropped to it, or (None, None)
+    if seed is not in a True cell.
+    """
+    cells, rows = _row_cells(*matches.shape)
+    rows[:] = matches
+    return _flood(cells, *matches.shape, seed)
+
+
+def _flood(cells, height, width, seed):
+    """flood_mask() on the cells of _row_cells().
+
+    Scanline fill over spans: the runs of True cells of every row are found
+    at once with NumPy, and the search visits runs, never single pixels.
+    """
+    x, y = seed
+    stride = width + 1
+    if not cells[1 + y * stride + x]:
+        return None, None
+    changes = np.flatnonzero(cells[1:] != cells[:-1])
+    rising = cells[changes + 1] == 1
+    starts = changes[rising]
+    ends = changes[~rising]  # exclusive, same row as the matching start
+    # Runs of the rows above and below that overlap each run, as index ranges
+    # (runs are sorted, so shifting a run by a row lands between its neighbours)
+    neighbours = [np.searchsorted(ends, starts + shift, 'right').tolist()
+                  for shift in (-stride, stride)]
+    neighbours += [np.searchsorted(starts, ends + shift, 'left').tolist()
+                   for shift in (-stride, stride)]
+    above_low, below_low, above_high, below_high = neighbours
+
+    run = int(np.searchsorted(starts, y * stride + x, 'right')) - 1
+    filled = bytearray(len(starts))
+    filled[run] = 1
+    stack = [run]
+    while stack:
+        run = stack.pop()
+        for other in range(above_low[run], above_high[run]):
+            if not filled[other]:
+                filled[other] = 1
+                stack.append(other)
+        for other in range(below_low[run], below_high[run]):
+            if not filled[other]:
+                filled[other] = 1
+                stack.append(other)
+
+    filled = np.frombuffer(filled, bool)
+    starts, ends = starts[filled], ends[filled]
+    rows = starts // stride
+    top, bottom = int(rows[0]), int(rows[-1]) + 1
+    left, right = int((starts - rows * stride).min()), int((ends - rows * stride).max())
+    # Spell out the box as alternating gaps and filled runs
+    bounds = np.empty(2 * len(starts) + 2, np.int64)
+    bounds[0], bounds[-1] = top * stride, bottom * stride
+    bounds[1:-1:2], bounds[2:-1:2] = starts, ends
+    values = np.zeros(len(bounds) - 1, bool)
+    values[1::2] = True
+    mask = np.repeat(values, np.diff(bounds)).reshape(bottom - top, stride)[:, left:right]
+    return (left, top, right, bottom), mask
+
+
+def search_area(canvas, seed, window=WINDOW):
+    """Document rect a fill at seed may spread over"""
+    area = pygame.Rect(0, 0, window, window)
+    area.center = seed
+    return area.clip(canvas.get_rect())
+
+
+def find(canvas, seed, color, tolerance=0, window=WINDOW, report=None):
+    """Region of a tiledcanvas.TiledCanvas that a fill at seed with color would change.
+
+    The region is the pixels connected to seed whose color is within
+    tolerance of the seed's, searched inside a window x window square of the
+    document around seed. Matching pixels are found tile by tile, with blank
+    tiles settled by their background color alone. Returns (rect, mask) for
+    paint(), with mask a boolean [x, y] array over rect, or None if the fill
+    changes nothing. report, if given, is called with the fraction of tiles
+    compared so far (see jobs.Job.report).
+    """
+    area = search_area(canvas, seed, window)
+    if not area.collidepoint(seed):
+        return None
+    target = canvas.read((seed, (1, 1))).get_at((0, 0))[:3]
+    if tuple(target) == tuple(color[:3]) and tolerance == 0:
+        return None
+    cells, matches = _row_cells(area.height, area.width)
+    blank = all(abs(a - b) <= tolerance for a, b in zip(canvas.background, target))
+    keys = canvas.tiles_in(area)
+    for done, key in enumerate(keys):
+        if report:
+            report(done / len(keys))
+        origin = canvas.tile_rect(key)
+        part = origin.clip(area)
+        view = matches[part.y - area.y:part.bottom - area.y, part.x - area.x:part.right - area.x]
+        tile = canvas.get_tile(key)
+        if tile is None:
+            view[:] = blank
+        else:
+            view[:] = matching(tile.subsurface(part.move(-origin.x, -origin.y)), target, tolerance)
+    (left, top, right, bottom), mask = _flood(cells, area.height, area.width, (seed[0] - area.x, seed[1] - area.y))
+    return pygame.Rect(area.x + left, area.y + top, right - left, bottom - top), mask.T
+
+
+def paint(canvas, rect, mask, color):
+    """Set the pixels of mask (from find()) to color; only tiles under them are written"""
+    def draw(layer, dx, dy):
+        # layer is a temporary surface over rect, or a tile for very large fills
+        target = rect.move(dx, dy).clip(layer.get_rect())
+        part = mask[target.x - rect.x - dx:target.right - rect.x - dx,
+                    target.y - rect.y - dy:target.bottom - rect.y - dy]
+        if not part.any():
+            return pygame.Rect(target.topleft, (0, 0))
+        pygame.surfarray.pixels2d(layer)[target.x:target.right, target.y:target.bottom][part] = layer.map_rgb(color)
+        return target
+
+    return canvas.draw(rect, color, draw)
+
+
+def fill(canvas, seed, color, tolerance=0, window=WINDOW):
+    """Bucket-fill around seed; return the changed document rect or None"""
+    region = find(canvas, seed, color, tolerance, window)
+    return paint(canvas, *region, color) if region else None
+
+
+def check_stored_tiles():
+    """Fill tiles that were paged out, opened from a file and copied, at tolerance 0 and above.
+
+    Those tiles are rebuilt from RGB bytes rather than drawn in memory, so this
+    catches a tile surface the pixel arrays cannot map. Raises AssertionError
+    on a wrong result; returns the number of fills checked.
+    """
+    import os
+    import tempfile
+    import paintfile
+    import tiledcanvas
+
+    checked = 0
+    for tolerance in (0, 16):
+        canvas = tiledcanvas.TiledCanvas(2048, 2048, max_resident=2)
+        canvas.rect((0, 0, 255), (10, 10, 300, 300), 2)
+        for x in range(0, 2048, tiledcanvas.TILE):
+            canvas.line((0, 0, 0), (x, 1000), (x + 10, 1000))  # pages the first tiles out
+        assert canvas.page_outs
+        fill(canvas, (20, 20), (255, 0, 0), tolerance)
+        assert canvas.read((20, 20, 1, 1)).get_at((0, 0))[:3] == (255, 0, 0)
+        assert canvas.read((400, 400, 1, 1)).get_at((0, 0))[:3] == (255, 255, 255)
+
+        handle, path = tempfile.mkstemp(suffix='.ptil')
+        os.close(handle)
+        try:
+            paintfile.save(canvas, path)
+            opened = paintfile.load(path)
+            snapshot = opened.copy(search_area(opened, (400, 400)))
+            fill(opened, (400, 400), (0, 255, 0), tolerance)
+            assert opened.read((400, 400, 1, 1)).get_at((0, 0))[:3] == (0, 255, 0)
+            assert opened.read((20, 20, 1, 1)).get_at((0, 0))[:3] == (255, 0, 0)
+            region = find(snapshot, (20, 20), (0, 0, 255), tolerance)
+            assert region and region[1].sum() == 296 * 296
+            snapshot.close()
+            opened.close()
+        finally:
+            os.remove(path)
+        canvas.close()
+        checked += 3
+    return checked
+
+
+if __name__ == "__main__":
+    print(f"stored tile check OK: {check_stored_tiles()} fills")
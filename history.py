@@ -0,0 +1,202 @@
+import zlib
+
+import pygame
+
+# Side of the square tiles the canvas is split into
+TILE = 64
+# Default memory budget for undo history
+BUDGET = 64 * 1024 * 1024
+# Entries kept as raw surfaces; older ones are zlib-compressed
+HOT_ENTRIES = 4
+# Raw snapshot bytes an open action may hold; past this, snapshots are compressed as taken
+RAW_PENDING = 16 * 1024 * 1024
+
+
+class TileSnapshot:
+    """Saved pixels of one tile: a surface copy, compressed bytes or a single color"""
+    __slots__ = ('rect', 'surface', 'data', 'color', 'format')
+
+    def __init__(self, canvas, rect):
+        self.rect = rect
+        self.surface = None
+        self.data = None
+        self.color = None
+        self.format = 'RGB'
+        if isinstance(canvas, pygame.Surface):
+            self.surface = canvas.subsurface(rect).copy()
+        elif canvas.is_blank(rect):
+            self.color = canvas.background  # never drawn on in a sparse canvas
+        else:
+            self.surface = canvas.read(rect)
+
+    @property
+    def nbytes(self):
+        if self.surface is not None:
+            return self.rect.width * self.rect.height * self.surface.get_bytesize()
+        if self.data is not None:
+            return len(self.data)
+        return 4
+
+    def compress(self):
+        surface = self.surface
+        if surface is None:
+            return
+        self.surface = None
+        self.format = 'RGBA' if surface.get_flags() & pygame.SRCALPHA else 'RGB'
+        # Blank and cleared tiles are a single color; keep just that
+        color = surface.get_at((0, 0))
+        matching = pygame.mask.from_threshold(surface, color, (1, 1, 1, 255)).count()
+        if matching == self.rect.width * self.rect.height:
+            self.color = color
+        else:
+            self.data = zlib.compress(pygame.image.tobytes(surface, self.format), 1)
+
+    def restore(self, canvas):
+        surface = self.surface
+        if surface is not None:
+            canvas.blit(surface, self.rect)
+        elif self.color is not None:
+            canvas.fill(self.color, self.rect)
+        else:
+            surface = pygame.image.frombytes(zlib.decompress(self.data), self.rect.size, self.format)
+            canvas.blit(surface, self.rect)
+
+
+class Entry:
+    """One undoable action: before and after snapshots of the tiles it touched.
+
+    tag is whatever the caller passed to commit(), e.g. the action's vector data.
+    """
+    __slots__ = ('before', 'after', 'tag', 'nbytes')
+
+    def __init__(self, before, after, tag=None):
+        self.before = before
+        self.after = after
+        self.tag = tag
+        self.nbytes = sum(snapshot.nbytes for snapshot in before + after)
+
+    def compress(self):
+        for snapshot in self.before + self.after:
+            snapshot.compress()
+        self.nbytes = sum(snapshot.nbytes for snapshot in self.before + self.after)
+
+
+class History:
+    """Tile-based copy-on-write undo/redo for a surface or tiledcanvas.TiledCanvas.
+
+    Call begin() before an action, touch(rect) before drawing into rect, and
+    commit() when the action is done. The first touch of a tile in an action
+    saves its pixels, so an entry holds only the tiles the action changed and
+    undo/redo cost depends on that, never on the canvas size. Entries older
+    than the last HOT_ENTRIES are compressed, and the oldest are dropped once
+    the history outgrows budget bytes. An action too large to keep raw (past
+    RAW_PENDING bytes, or more than the budget left) is compressed as it is
+    saved, and the newest action is never dropped, however large.
+    """
+
+    def __init__(self, canvas, tile=TILE, budget=BUDGET):
+        self.canvas = canvas
+        self.tile = tile
+        self.budget = budget
+        self.columns = -(-canvas.get_width() // tile)
+        self.undo_stack = []
+        self.redo_stack = []
+        self.nbytes = 0
+        self.pending = None  # tile index -> before snapshot of the open action
+        self.pending_raw = 0  # raw bytes of the snapshots taken for it
+
+    def begin(self):
+        """Open an action (a stroke, shape or clear); a still open one is committed first"""
+        self.commit()
+        self.pending = {}
+        self.pending_raw = 0
+
+    def touch(self, rect):
+        """Save the tiles under rect that this action has not touched yet"""
+        if self.pending is None:
+            return
+        rect = pygame.Rect(rect).clip(self.canvas.get_rect())
+        if not rect:
+            return
+        tile = self.tile
+        pending = self.pending
+        for row in range(rect.top // tile, (rect.bottom - 1) // tile + 1):
+            for column in range(rect.left // tile, (rect.right - 1) // tile + 1):
+                index = row * self.columns + column
+                if index not in pending:
+                    pending[index] = self._snapshot(self._tile_rect(index))
+
+    def _snapshot(self, rect):
+        snapshot = TileSnapshot(self.canvas, rect)
+        self.pending_raw += snapshot.nbytes
+        if self.pending_raw > RAW_PENDING:
+            snapshot.compress()
+        return snapshot
+
+    def _tile_rect(self, index):
+        row, column = divmod(index, self.columns)
+        return pygame.Rect(column * self.tile, row * self.tile,
+                           self.tile, self.tile).clip(self.canvas.get_rect())
+
+    def commit(self, tag=None):
+        """Close the open action and push it onto the undo stack"""
+        pending = self.pending
+        self.pending = None
+        if not pending:
+            return
+        before = list(pending.values())
+        after = [self._snapshot(snapshot.rect) for snapshot in before]
+        entry = Entry(before, after, tag)
+        if self.nbytes + entry.nbytes > self.budget:
+            entry.compress()
+        self._push(self.undo_stack, entry)
+        for entry in self.redo_stack:
+            self.nbytes -= entry.nbytes
+        self.redo_stack.clear()
+        self._evict()
+
+    def _push(self, stack, entry):
+        stack.append(entry)
+        self.nbytes += entry.nbytes
+        if len(stack) > HOT_ENTRIES:
+            cold = stack[-HOT_ENTRIES - 1]
+            self.nbytes -= cold.nbytes
+            cold.compress()
+            self.nbytes += cold.nbytes
+
+    def _evict(self):
+        """Drop the oldest undo entries until the history fits the budget, keeping the newest"""
+        while self.nbytes > self.budget and len(self.undo_stack) > 1:
+            self.nbytes -= self.undo_stack.pop(0).nbytes
+
+    def undo(self):
+        """Restore the tiles of the last action and return its entry (None if there is none)"""
+        self.commit()
+        if not self.undo_stack:
+            return None
+        entry = self.undo_stack.pop()
+        self.nbytes -= entry.nbytes
+        for snapshot in entry.before:
+            snapshot.restore(self.canvas)
+        self._push(self.redo_stack, entry)
+        return entry
+
+    def redo(self):
+        """Re-apply the last undone action and return its entry (None if there is none)"""
+        self.commit()
+        if not self.redo_stack:
+            return None
+        entry = self.redo_stack.pop()
+        self.nbytes -= entry.nbytes
+        for snapshot in entry.after:
+            snapshot.restore(self.canvas)
+        self._push(self.undo_stack, entry)
+        return entry
+
+    def stats(self):
+        return {
+            'undo': len(self.undo_stack),
+            'redo': len(self.redo_stack),
+            'bytes': self.nbytes,
+            'budget': self.budget,
+        }
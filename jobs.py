@@ -0,0 +1,244 @@
+import abc
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import numpy as np
+import pygame
+
+import floodfill
+import strokes
+
+
+class Cancelled(Exception):
+    """Raised by Job.report() once the job has been cancelled"""
+
+
+class Job(abc.ABC):
+    """A heavy canvas operation split between a worker thread and the main loop.
+
+    The constructor runs on the main loop and copies what the job needs with
+    take_snapshot(). work(report) runs in a JobRunner's pool on those copies
+    only, calling report(fraction) as it goes; report raises Cancelled once
+    cancel() has been called. apply(result) runs on the main loop from
+    JobRunner.poll(), so the canvas changes all at once between frames and
+    as one undo step. If the tiles the result depends on were drawn on
+    meanwhile (see outdated()), the result is dropped rather than written
+    over those edits, and the job ends with stale set.
+    """
+
+    name = 'job'
+
+    def __init__(self):
+        self.fraction = 0.0
+        self.cancelled = threading.Event()
+        self.future = None
+        self.error = None
+        self.stale = False
+        self.source = None  # canvas copied by take_snapshot()
+        self.edits = None  # its tile edit counts at that time
+
+    def report(self, fraction):
+        if self.cancelled.is_set():
+            raise Cancelled
+        self.fraction = fraction
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def take_snapshot(self, canvas, rect):
+        """Copy of the tiles of canvas under rect for work(), remembering their edit counts"""
+        self.source = canvas
+        self.edits = canvas.edits_in(rect)
+        return canvas.copy(rect)
+
+    def changed(self, rect=None):
+        """True if any snapshot tile under rect (all if None) was edited since take_snapshot()"""
+        keys = self.edits if rect is None else [key for key in self.source.tiles_in(rect) if key in self.edits]
+        edits = self.source.edits
+        return any(edits.get(key, 0) != self.edits[key] for key in keys)
+
+    def outdated(self, result):
+        """True if result no longer matches the canvas; by default, if any snapshot tile changed"""
+        return self.source is not None and self.changed()
+
+    @abc.abstractmethod
+    def work(self, report):
+        """Compute the result from the job's copies, on a worker thread"""
+
+    @abc.abstractmethod
+    def apply(self, result):
+        """Write the result of work() into the canvas, on the main loop"""
+
+
+class JobRunner:
+    """Runs Jobs on a thread pool and applies their results from poll().
+
+    Threads rather than processes: the heavy parts (NumPy, zlib, pygame
+    blits) release the GIL, and tiles need no pickling. With workers=0 jobs
+    run to completion and are applied inside submit(), which keeps headless
+    runs and replays deterministic; the next poll() still returns them.
+    """
+
+    def __init__(self, workers=None):
+        self.pool = ThreadPoolExecutor(workers or os.cpu_count()) if workers != 0 else None
+        self.jobs = []
+        self.ended = []  # jobs finished by submit() that poll() has not returned yet
+
+    def submit(self, job):
+        if self.pool:
+            job.future = self.pool.submit(job.work, job.report)
+            self.jobs.append(job)
+        else:
+            job.future = Future()
+            try:
+                job.future.set_result(job.work(job.report))
+            except Exception as error:
+                job.future.set_exception(error)
+            self._finish(job)
+            self.ended.append(job)
+        return job
+
+    def active(self):
+        """True while jobs run or ended ones are waiting for poll()"""
+        return bool(self.jobs or self.ended)
+
+    def poll(self, hold=False):
+        """Apply the results of finished jobs; return the jobs that ended, done or not.
+
+        With hold, finished jobs are kept for a later poll() instead, e.g.
+        while the user is in the middle of an undoable action.
+        """
+        if hold:
+            return []
+        ended = [job for job in self.jobs if job.future.done()]
+        for job in ended:
+            self.jobs.remove(job)
+            self._finish(job)
+        ended, self.ended = self.ended + ended, []
+        return ended
+
+    def _finish(self, job):
+        if job.cancelled.is_set():
+            return
+        try:
+            result = job.future.result()
+        except Exception as error:
+            job.error = error
+        else:
+            if job.outdated(result):
+                job.stale = True
+            else:
+                job.apply(result)
+
+    def cancel_all(self):
+        for job in self.jobs:
+            job.cancel()
+
+    def progress(self):
+        """Mean progress of the running jobs, or None if there are none"""
+        if not self.jobs:
+            return None
+        return sum(job.fraction for job in self.jobs) / len(self.jobs)
+
+    def shutdown(self):
+        """Cancel running jobs and stop the pool without applying anything"""
+        self.cancel_all()
+        self.jobs.clear()
+        self.ended.clear()
+        if self.pool:
+            self.pool.shutdown(wait=False)
+
+
+class FillJob(Job):
+    """Bucket fill searched off the main loop (floodfill.find on a copy of its window)"""
+
+    name = 'fill'
+
+    def __init__(self, canvas, history, seed, color, tolerance=0):
+        super().__init__()
+        self.canvas = canvas
+        self.history = history
+        self.seed = seed
+        self.color = color
+        self.tolerance = tolerance
+        self.snapshot = self.take_snapshot(canvas, floodfill.search_area(canvas, seed))
+
+    def work(self, report):
+        return floodfill.find(self.snapshot, self.seed, self.color, self.tolerance, report=report)
+
+    def outdated(self, region):
+        # The region only depends on its own pixels and the ones bordering it
+        return region is not None and self.changed(region[0].inflate(2, 2))
+
+    def apply(self, region):
+        if region:
+            self.history.begin()
+            self.history.touch(region[0])
+            floodfill.paint(self.canvas, *region, self.color)
+            self.history.commit()
+
+
+def grayscale(pixels):
+    """Replace an [x, y, rgb] pixel view with its luma (white and black are kept)"""
+    rgb = pixels.astype(np.uint16)
+    luma = (rgb[:, :, 0] * 77 + rgb[:, :, 1] * 150 + rgb[:, :, 2] * 29) >> 8
+    pixels[:] = luma.astype(np.uint8)[:, :, None]
+
+
+class FilterJob(Job):
+    """Per-pixel filter over a document rect, run tile by tile on a copy.
+
+    filter(pixels) edits a pygame.surfarray.pixels3d view in place and must
+    map the background color to itself, so blank tiles are skipped.
+    """
+
+    name = 'filter'
+
+    def __init__(self, canvas, history, rect, filter=grayscale):
+        super().__init__()
+        self.canvas = canvas
+        self.history = history
+        self.rect = pygame.Rect(rect).clip(canvas.get_rect())
+        self.filter = filter
+        self.snapshot = self.take_snapshot(canvas, self.rect)
+
+    def work(self, report):
+        snapshot = self.snapshot
+        keys = [key for key in snapshot.tiles_in(self.rect) if snapshot.allocated(key)]
+        parts = []
+        for done, key in enumerate(keys):
+            report(done / len(keys))
+            origin = snapshot.tile_rect(key)
+            part = origin.clip(self.rect)
+            surface = snapshot.get_tile(key).subsurface(part.move(-origin.x, -origin.y)).copy()
+            self.filter(pygame.surfarray.pixels3d(surface))
+            parts.append((part.topleft, surface))
+        return parts
+
+    def apply(self, parts):
+        if parts:
+            self.history.begin()
+            self.history.touch(self.rect)
+            for position, surface in parts:
+                self.canvas.blit(surface, position)
+            self.history.commit()
+
+
+class StrokeExportJob(Job):
+    """Re-rasterize a stroke log at another scale and save it as an image file"""
+
+    name = 'stroke export'
+
+    def __init__(self, stroke_log, size, path, scale=1):
+        super().__init__()
+        self.strokes = tuple(stroke_log)  # the strokes themselves never change once drawn
+        self.size = size
+        self.path = path
+        self.scale = scale
+
+    def work(self, report):
+        pygame.image.save(strokes.rasterize(self.strokes, self.size, self.scale, report=report), self.path)
+
+    def apply(self, result):
+        pass
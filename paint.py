@@ -1,7 +1,17 @@
+import os
 import pygame
 import sys
 from pygame.locals import *
 
+import history
+import jobs
+import paintfile
+import profiler
+import replay
+import strokes
+import textcache
+import tiledcanvas
+
 # Initialize pygame
 pygame.init()
 
@@ -18,29 +28,84 @@ PURPLE = (255, 0, 255)
 CYAN = (0, 255, 255)
 GRAY = (150, 150, 150)
 
+# Toolbar strip, repainted over the canvas when its buttons change
+TOOLBAR = pygame.Rect(0, 0, WINDOW_WIDTH, 60)
+# Dirty rects per frame before they are merged into one
+MAX_DIRTY = 16
+# Longest idle wait for input (ms); background work polls every frame instead
+IDLE_TIMEOUT = 1000
+
+# Screen distance scrolled per arrow key
+PAN_STEP = 64
+PAN_KEYS = {K_LEFT: (-PAN_STEP, 0), K_RIGHT: (PAN_STEP, 0), K_UP: (0, -PAN_STEP), K_DOWN: (0, PAN_STEP)}
+
 # Tool modes
 PEN = 0
 RECTANGLE = 1
 CIRCLE = 2
 ERASER = 3
+FILL = 4
+
+# Change of the fill tolerance per [ or ] key press (per channel, 0-255)
+TOLERANCE_STEP = 16
+
+# Scale of the stroke log exported with Ctrl+P, reduced to keep within
+# STROKE_EXPORT_SIDE pixels on the longer side
+STROKE_EXPORT_SCALE = 2
+STROKE_EXPORT_SIDE = 8192
 
 class PaintApp:
-    def __init__(self):
-        """Initialize the paint application"""
-        self.screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
-        pygame.display.set_caption("Paint Application")
+    def __init__(self, headless=False, history_budget=history.BUDGET,
+                 document_size=(WINDOW_WIDTH, WINDOW_HEIGHT), document_path=None):
+        """Initialize the paint application.
+
+        history_budget is the undo memory in bytes; documents larger than the
+        window are panned with the arrow keys or middle mouse button and zoomed
+        with +/- (0 resets the view). With a document_path, Ctrl+S saves to it
+        in the background, Ctrl+E also exports a PNG next to it, Ctrl+P
+        exports the pen and eraser strokes re-rasterized at a larger scale
+        and Ctrl+O reopens it (except while recording, as replays start
+        blank); an existing file is opened instead of a blank document.
+        Fills and the G (grayscale) filter run as background jobs; Escape
+        cancels them and any save.
+        """
+        self.headless = headless
+        if headless:
+            self.screen = pygame.Surface((WINDOW_WIDTH, WINDOW_HEIGHT))
+        else:
+            self.screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
+            pygame.display.set_caption("Paint Application")
+        self.recorder = None
+        self.profile_path = None
+        self.profiler = profiler.FrameProfiler(('events', 'ui', 'present'), 60)
         
         self.clock = pygame.time.Clock()
         self.drawing = False
-        self.last_pos = None
+        self.stroke = None  # strokes.Stroke being drawn with PEN or ERASER
+        self.stroke_drawn = 0  # points of it already on the canvas
         self.color = BLACK
         self.brush_size = 5
         self.mode = PEN
-        self.start_pos = None  # For shapes
+        self.start_pos = None  # For shapes (document coordinates)
+        self.pan_pos = None  # Last mouse position of a middle-button pan
         
-        # Create a surface for drawing that we can modify
-        self.canvas = pygame.Surface((WINDOW_WIDTH, WINDOW_HEIGHT))
-        self.canvas.fill(WHITE)
+        # Sparse tiled document, shown through a pan/zoom viewport
+        self.document_path = document_path
+        self.saver = None  # paintfile.Saver of a save in progress
+        # Heavy operations (fill, filters) run here; headless runs stay
+        # synchronous so replays are deterministic
+        self.jobs = jobs.JobRunner(0 if headless else None)
+        self.history_budget = history_budget
+        self.canvas = None
+        if document_path and os.path.exists(document_path):
+            self.open_document()
+        else:
+            self.set_canvas(tiledcanvas.TiledCanvas(*document_size, background=WHITE))
+        
+        # Shape preview layer, composited over the canvas in run(); only
+        # preview_rect holds anything, the rest stays transparent
+        self.preview = pygame.Surface((WINDOW_WIDTH, WINDOW_HEIGHT), pygame.SRCALPHA)
+        self.preview_rect = None
         
         # Available colors
         self.colors = [
@@ -58,8 +123,10 @@ class PaintApp:
             ("Pen", (350, 10), PEN),
             ("Rect", (400, 10), RECTANGLE),
             ("Circle", (450, 10), CIRCLE),
-            ("Eraser", (500, 10), ERASER)
+            ("Eraser", (500, 10), ERASER),
+            ("Fill", (550, 10), FILL)
         ]
+        self.fill_tolerance = 0
         
         # Brush size buttons
         self.sizes = [
@@ -70,6 +137,8 @@ class PaintApp:
 
     def draw_ui(self):
         """Draw the user interface elements"""
+        font = textcache.get_font(None, 20)
+        
         # Draw color palette
         for color, pos in self.colors:
             pygame.draw.rect(self.screen, color, (*pos, 30, 30))
@@ -80,27 +149,158 @@ class PaintApp:
         for text, pos, mode in self.tools:
             color = BLUE if self.mode == mode else GRAY
             pygame.draw.rect(self.screen, color, (*pos, 50, 30))
-            text_surf = pygame.font.SysFont(None, 20).render(text, True, BLACK)
+            text_surf = textcache.render_text(font, text, True, BLACK)
             self.screen.blit(text_surf, (pos[0] + 5, pos[1] + 5))
+        if self.mode == FILL:
+            text_surf = textcache.render_text(font, f"tol {self.fill_tolerance}", True, BLACK)
+            self.screen.blit(text_surf, (555, 45))
         
         # Draw brush size buttons
         for text, pos, size in self.sizes:
             color = BLUE if self.brush_size == size else GRAY
             pygame.draw.rect(self.screen, color, (*pos, 50, 30))
-            text_surf = pygame.font.SysFont(None, 20).render(text, True, BLACK)
+            text_surf = textcache.render_text(font, text, True, BLACK)
             self.screen.blit(text_surf, (pos[0] + 5, pos[1] + 5))
         
         # Draw clear button
         pygame.draw.rect(self.screen, RED, (WINDOW_WIDTH - 100, 10, 80, 30))
-        text_surf = pygame.font.SysFont(None, 20).render("Clear", True, WHITE)
+        text_surf = textcache.render_text(font, "Clear", True, WHITE)
         self.screen.blit(text_surf, (WINDOW_WIDTH - 90, 15))
 
-    def handle_events(self):
-        """Handle user input events"""
-        for event in pygame.event.get():
+    def set_canvas(self, canvas):
+        """Show a new document with a fresh view, undo history and stroke log"""
+        self.canvas = canvas
+        self.view = tiledcanvas.Viewport()
+        self.history = history.History(canvas, budget=self.history_budget)
+        canvas.track_damage()
+        # Pen and eraser strokes drawn on the document, in drawing order, kept in
+        # step with undo and redo for export_strokes(); fills, shapes and
+        # opened files are not in it
+        self.strokes = []
+
+    def open_document(self):
+        """Replace the canvas with the saved document; tiles load as they are shown"""
+        old = self.canvas
+        self.jobs.cancel_all()
+        self.set_canvas(paintfile.load(self.document_path))
+        if old:
+            old.close()
+        self.set_status("opened")
+
+    def save_document(self, export_png=False):
+        """Start a background save of the canvas (and a PNG export)"""
+        png_path = os.path.splitext(self.document_path)[0] + '.png' if export_png else None
+        self.saver = paintfile.Saver(self.canvas, self.document_path, png_path)
+
+    def export_strokes(self):
+        """Re-rasterize the stroke log into a PNG next to the document, in the background"""
+        size = self.canvas.get_size()
+        scale = min(STROKE_EXPORT_SCALE, STROKE_EXPORT_SIDE / max(size))
+        path = os.path.splitext(self.document_path)[0] + '-strokes.png'
+        self.jobs.submit(jobs.StrokeExportJob(self.strokes, size, path, scale))
+
+    def poll_save(self):
+        """Advance a save in progress by a slice of this frame"""
+        if self.saver.poll():
+            saver, self.saver = self.saver, None
+            if saver.cancelled:
+                self.set_status("save cancelled")
+            elif saver.error:
+                self.set_status(f"save failed: {saver.error}")
+            else:
+                self.set_status(f"saved in {saver.elapsed:.2f}s")
+        else:
+            self.set_status(f"saving {self.saver.progress():.0%}")
+
+    def poll_jobs(self):
+        """Apply the results of finished background jobs"""
+        # Not in the middle of a stroke or shape: apply() begins its own undo
+        # action, which would close the open one early
+        for job in self.jobs.poll(hold=self.drawing or self.history.pending is not None):
+            if job.cancelled.is_set():
+                self.set_status(f"{job.name} cancelled")
+            elif job.error:
+                self.set_status(f"{job.name} failed: {job.error}")
+            elif job.stale:
+                self.set_status(f"{job.name} dropped: the drawing changed while it ran")
+            else:
+                self.set_status(f"{job.name} done")
+        progress = self.jobs.progress()
+        if progress is not None:
+            self.set_status(f"working {progress:.0%}")
+
+    def set_status(self, status):
+        if not self.headless:
+            pygame.display.set_caption(f"Paint Application - {self.document_path} ({status})")
+
+    def quit(self):
+        """Finish any save, close any session recording and exit"""
+        self.jobs.shutdown()
+        if self.saver:
+            try:
+                self.saver.wait()
+            except Exception as error:
+                # Still close the recording and profile below
+                print(f"{self.document_path}: save failed: {error}", file=sys.stderr)
+        if self.recorder:
+            self.recorder.close(replay.paint_digest(self.canvas))
+        if self.profile_path:
+            self.profiler.export(self.profile_path)
+        pygame.quit()
+        sys.exit()
+
+    def handle_events(self, events=None):
+        """Handle user input events (from the queue unless events are given)"""
+        if events is None:
+            events = pygame.event.get()
+        for event in events:
             if event.type == QUIT:
-                pygame.quit()
-                sys.exit()
+                self.quit()
+            
+            elif event.type == KEYDOWN:
+                if event.key == K_F3:
+                    self.profiler.toggle_overlay()
+                elif event.mod & KMOD_CTRL and not self.drawing:
+                    # Ctrl+Z undo, Ctrl+Y or Ctrl+Shift+Z redo
+                    if event.key == K_z and event.mod & KMOD_SHIFT or event.key == K_y:
+                        entry = self.history.redo()
+                        if entry:
+                            self.redo_log(entry.tag)
+                    elif event.key == K_z:
+                        entry = self.history.undo()
+                        if entry:
+                            self.undo_log(entry.tag)
+                    # Ctrl+S save, Ctrl+E save and export PNG, Ctrl+P export
+                    # the strokes, Ctrl+O reopen
+                    elif self.document_path and not self.saver:
+                        if event.key in (K_s, K_e):
+                            self.save_document(event.key == K_e)
+                        elif event.key == K_p:
+                            self.export_strokes()
+                        elif event.key == K_o and os.path.exists(self.document_path):
+                            # A replay could not know what the file held
+                            if self.recorder:
+                                self.set_status("cannot open while recording")
+                            else:
+                                self.open_document()
+                elif event.key in PAN_KEYS:
+                    self.view.pan(*PAN_KEYS[event.key])
+                elif event.key in (K_EQUALS, K_PLUS, K_KP_PLUS, K_MINUS, K_KP_MINUS):
+                    steps = -1 if event.key in (K_MINUS, K_KP_MINUS) else 1
+                    self.view.zoom_by(steps, self.screen.get_rect().center)
+                elif event.key == K_0:
+                    self.view = tiledcanvas.Viewport()
+                elif event.key == K_g:
+                    # Grayscale filter over the part of the document on screen
+                    visible = self.view.to_document_rect(self.screen.get_rect())
+                    self.jobs.submit(jobs.FilterJob(self.canvas, self.history, visible))
+                elif event.key == K_ESCAPE:
+                    self.jobs.cancel_all()
+                    if self.saver:
+                        self.saver.cancel()
+                elif event.key in (K_LEFTBRACKET, K_RIGHTBRACKET):
+                    step = TOLERANCE_STEP if event.key == K_RIGHTBRACKET else -TOLERANCE_STEP
+                    self.fill_tolerance = min(max(self.fill_tolerance + step, 0), 255)
             
             elif event.type == MOUSEBUTTONDOWN:
                 if event.button == 1:  # Left click
@@ -124,82 +324,256 @@ class PaintApp:
                     
                     # Check if clicking clear button
                     if pygame.Rect(WINDOW_WIDTH - 100, 10, 80, 30).collidepoint(event.pos):
-                        self.canvas.fill(WHITE)
+                        # Blank tiles stay blank, so only drawn ones are saved
+                        drawn = self.canvas.keys()
+                        if drawn:
+                            self.history.begin()
+                            for key in drawn:
+                                self.history.touch(self.canvas.tile_rect(key))
+                            self.canvas.fill(WHITE)
+                            self.history.commit(tuple(self.strokes))
+                            self.strokes = []
+                        return
+                    
+                    if self.mode == FILL:
+                        self.fill(self.view.to_document(event.pos))
                         return
                     
                     # Start drawing
+                    self.history.begin()
                     self.drawing = True
-                    self.last_pos = event.pos
-                    self.start_pos = event.pos
+                    self.start_pos = self.view.to_document(event.pos)
+                    if self.mode in (PEN, ERASER):
+                        self.stroke = strokes.Stroke(WHITE if self.mode == ERASER else self.color,
+                                                     self.brush_size, [self.start_pos])
+                        self.stroke_drawn = 0
+                elif event.button == 2:  # Middle button pans
+                    self.pan_pos = event.pos
             
             elif event.type == MOUSEBUTTONUP:
                 if event.button == 1:  # Left click release
                     self.drawing = False
+                    self.clear_preview()
                     if self.mode in [RECTANGLE, CIRCLE] and self.start_pos:
                         # Draw the final shape
-                        self.draw_shape(self.start_pos, event.pos, True)
+                        self.draw_shape(self.start_pos, self.view.to_document(event.pos), True)
                     self.start_pos = None
+                    stroke = self.stroke
+                    if stroke:
+                        self.flush_stroke()
+                        self.strokes.append(stroke)
+                        self.stroke = None
+                    self.history.commit(stroke)
+                elif event.button == 2:
+                    self.pan_pos = None
+            
+            elif event.type == MOUSEMOTION and self.pan_pos:
+                self.view.pan(self.pan_pos[0] - event.pos[0], self.pan_pos[1] - event.pos[1])
+                self.pan_pos = event.pos
             
             elif event.type == MOUSEMOTION and self.drawing:
-                if self.mode == PEN:
-                    self.draw_line(self.last_pos, event.pos)
-                    self.last_pos = event.pos
-                elif self.mode == ERASER:
-                    self.draw_line(self.last_pos, event.pos, True)
-                    self.last_pos = event.pos
+                if self.stroke:
+                    # Collected here, drawn once per frame by flush_stroke()
+                    self.stroke.add(self.view.to_document(event.pos))
                 elif self.mode in [RECTANGLE, CIRCLE]:
-                    # Redraw canvas to remove previous temporary shape
-                    temp_canvas = self.canvas.copy()
-                    self.draw_shape(self.start_pos, event.pos)
-                    self.canvas.blit(temp_canvas, (0, 0))
-                    self.draw_shape(self.start_pos, event.pos)
-
-    def draw_line(self, start, end, is_eraser=False):
-        """Draw a line between two points"""
-        color = WHITE if is_eraser else self.color
-        pygame.draw.line(self.canvas, color, start, end, self.brush_size)
-        # Draw circles at the ends for smoother lines
-        pygame.draw.circle(self.canvas, color, start, self.brush_size // 2)
-        pygame.draw.circle(self.canvas, color, end, self.brush_size // 2)
+                    self.update_preview(event.pos)
+
+    def flush_stroke(self):
+        """Draw the points the current stroke gained since the last call as one polyline.
+
+        Called once per frame, so all the motion events of a frame cost a
+        single rasterization pass; returns the changed document rect or None.
+        """
+        stroke = self.stroke
+        if not stroke or len(stroke) == self.stroke_drawn:
+            return None
+        # Restart at the last drawn point so the join to it is round
+        start = max(self.stroke_drawn - 1, 0)
+        self.history.touch(stroke.bounds(start))
+        self.stroke_drawn = len(stroke)
+        return stroke.render(self.canvas, start)
+
+    def fill(self, pos):
+        """Bucket-fill the region around pos (document coordinates) with the current color"""
+        if self.canvas.get_rect().collidepoint(pos):
+            self.jobs.submit(jobs.FillJob(self.canvas, self.history, pos, self.color, self.fill_tolerance))
+
+    def undo_log(self, tag):
+        """Keep the stroke log in step with an undone action"""
+        if isinstance(tag, strokes.Stroke):
+            self.strokes.remove(tag)
+        elif tag is not None:  # a clear; tag is the log it discarded
+            self.strokes = list(tag)
+
+    def redo_log(self, tag):
+        if isinstance(tag, strokes.Stroke):
+            self.strokes.append(tag)
+        elif tag is not None:
+            self.strokes = []
 
     def draw_shape(self, start, end, final=False):
-        """Draw a rectangle or circle"""
+        """Draw a rectangle or circle on the canvas, or translucent on the preview layer.
+
+        Final shapes take document coordinates, previews screen coordinates.
+        Returns the bounding rect of the pixels drawn.
+        """
         x1, y1 = start
         x2, y2 = end
         rect = pygame.Rect(min(x1, x2), min(y1, y2), abs(x1 - x2), abs(y1 - y2))
+        preview_color = (*self.color, 128)
+        preview_width = max(1, round(self.brush_size * self.view.zoom))
         
         if self.mode == RECTANGLE:
-            if final:
-                pygame.draw.rect(self.canvas, self.color, rect, self.brush_size)
-            else:
-                # Draw temporary rectangle (on screen, not canvas)
-                temp_surf = pygame.Surface((WINDOW_WIDTH, WINDOW_HEIGHT), pygame.SRCALPHA)
-                pygame.draw.rect(temp_surf, (*self.color, 128), rect, self.brush_size)
-                self.screen.blit(temp_surf, (0, 0))
+            if not final:
+                return pygame.draw.rect(self.preview, preview_color, rect, preview_width)
+            self.history.touch(rect.inflate(2, 2))
+            return self.canvas.rect(self.color, rect, self.brush_size)
         
         elif self.mode == CIRCLE:
             center = (x1 + (x2 - x1) // 2, y1 + (y2 - y1) // 2)
             radius = max(abs(x2 - x1) // 2, abs(y2 - y1) // 2)
-            if final:
-                pygame.draw.circle(self.canvas, self.color, center, radius, self.brush_size)
-            else:
-                # Draw temporary circle (on screen, not canvas)
-                temp_surf = pygame.Surface((WINDOW_WIDTH, WINDOW_HEIGHT), pygame.SRCALPHA)
-                pygame.draw.circle(temp_surf, (*self.color, 128), center, radius, self.brush_size)
-                self.screen.blit(temp_surf, (0, 0))
+            if not final:
+                return pygame.draw.circle(self.preview, preview_color, center, radius, preview_width)
+            self.history.touch((center[0] - radius - 1, center[1] - radius - 1,
+                                2 * radius + 3, 2 * radius + 3))
+            return self.canvas.circle(self.color, center, radius, self.brush_size)
+
+    def update_preview(self, end):
+        """Redraw the shape preview for a drag to end; return the area that changed.
+
+        Only the old and new bounding rects of the preview layer are touched,
+        and the canvas is left alone until the mouse is released.
+        """
+        old = self.clear_preview()
+        self.preview_rect = self.draw_shape(self.view.to_screen(self.start_pos), end)
+        return old.union(self.preview_rect) if old else self.preview_rect
+
+    def clear_preview(self):
+        """Erase the shape preview; return the rect it covered or None"""
+        old = self.preview_rect
+        if old:
+            self.preview.fill((0, 0, 0, 0), old)
+        self.preview_rect = None
+        return old or None
 
-    def run(self):
-        """Main application loop"""
+    def idle(self):
+        """True when nothing will change on screen until the next input event"""
+        return not (self.saver or self.jobs.active() or self.profiler.overlay_visible)
+
+    def redraw(self, full=False):
+        """Repaint what changed since the last call; return the screen rects to present.
+
+        Changes are found by comparison with what was last shown: canvas
+        damage (TiledCanvas.take_damage), the preview rect, the toolbar state
+        and the view. Only a view change, an expose or full=True repaints the
+        whole window.
+        """
+        screen_rect = self.screen.get_rect()
+        view = (self.canvas, self.view.offset, self.view.zoom)
+        damage = self.canvas.take_damage()
+        if full or view != self.shown_view:
+            dirty = [screen_rect]
+        else:
+            dirty = [self.view.to_screen_rect(rect).inflate(2, 2) for rect in damage]
+            if self.preview_rect != self.shown_preview:
+                dirty += [rect for rect in (self.shown_preview, self.preview_rect) if rect]
+            if self.toolbar_state() != self.shown_toolbar:
+                dirty.append(TOOLBAR)
+            if self.shown_overlay:
+                dirty.append(self.shown_overlay)
+            dirty = [rect.clip(screen_rect) for rect in dirty]
+            dirty = [rect for rect in dirty if rect]
+            if len(dirty) > MAX_DIRTY:
+                dirty = [dirty[0].unionall(dirty)]
+
+        for rect in dirty:
+            self.canvas.render(self.screen, self.view, rect)
+            if self.preview_rect and rect.colliderect(self.preview_rect):
+                part = rect.clip(self.preview_rect)
+                self.screen.blit(self.preview, part, part)
+        if any(rect.colliderect(TOOLBAR) for rect in dirty):
+            self.draw_ui()
+            dirty.append(TOOLBAR)
+        self.shown_overlay = self.profiler.draw_overlay(self.screen)
+        if self.shown_overlay:
+            dirty.append(self.shown_overlay)
+
+        self.shown_view = view
+        self.shown_preview = self.preview_rect
+        self.shown_toolbar = self.toolbar_state()
+        return dirty
+
+    def toolbar_state(self):
+        return (self.color, self.mode, self.brush_size, self.fill_tolerance)
+
+    def run(self, recorder=None, profile_path=None, event_driven=True):
+        """Main application loop.
+
+        With event_driven, an idle app blocks in pygame.event.wait() instead
+        of polling at 60 fps, and each frame repaints and presents only the
+        rects that changed.
+        """
+        self.recorder = recorder
+        if recorder:
+            if self.canvas.keys():
+                raise ValueError("a recorded session must start from a blank document")
+            recorder.size = self.canvas.get_size()
+            # Replays apply a job in the tick that submitted it, so a recorded
+            # session must too, however long its frames take
+            self.jobs.shutdown()
+            self.jobs = jobs.JobRunner(0)
+        self.profile_path = profile_path
+        profile = self.profiler
+        self.shown_view = self.shown_preview = self.shown_toolbar = self.shown_overlay = None
         while True:
-            self.screen.fill(WHITE)
-            self.screen.blit(self.canvas, (0, 0))
+            if event_driven and self.idle():
+                event = pygame.event.wait(IDLE_TIMEOUT)
+                events = ([] if event.type == NOEVENT else [event]) + pygame.event.get()
+            else:
+                events = pygame.event.get()
+            profile.begin_frame()
+            if self.saver:
+                self.poll_save()
+            if self.jobs.active():
+                self.poll_jobs()
             
-            self.handle_events()
-            self.draw_ui()
+            if recorder:
+                recorder.tick(replay.encode_paint_tick(events))
+            self.handle_events(events)
+            self.flush_stroke()
+            profile.mark('events')
+            exposed = any(event.type in (VIDEOEXPOSE, WINDOWEXPOSED) for event in events)
+            dirty = self.redraw(full=exposed or not event_driven)
+            profile.mark('ui')
             
-            pygame.display.flip()
+            if dirty:
+                pygame.display.update(dirty)
+            profile.mark('present')
+            profile.end_frame()
             self.clock.tick(60)
 
 if __name__ == "__main__":
-    app = PaintApp()
-    app.run()
\ No newline at end of file
+    import argparse
+    parser = argparse.ArgumentParser(description="Paint application")
+    parser.add_argument('--record', metavar='PATH',
+                        help="record the session for replay.py; needs a new --file, as replays start blank")
+    parser.add_argument('--profile', metavar='PATH',
+                        help="write frame timings on exit (.json summary or .csv per frame)")
+    parser.add_argument('--history-mb', type=float, default=history.BUDGET / 2 ** 20,
+                        help="memory budget for undo history in MiB (default %(default)g)")
+    parser.add_argument('--document', metavar='WxH', default=f"{WINDOW_WIDTH}x{WINDOW_HEIGHT}",
+                        help="size of a new document in pixels, e.g. 16384x16384 (default %(default)s)")
+    parser.add_argument('--file', metavar='PATH', default='drawing.ptil',
+                        help="document to open if it exists and to save with Ctrl+S (default %(default)s)")
+    parser.add_argument('--continuous', action='store_true',
+                        help="repaint the whole window 60 times a second even when idle")
+    args = parser.parse_args()
+    if args.record and os.path.exists(args.file):
+        parser.error(f"--record starts from a blank document, but {args.file} exists; "
+                     "pass --file with a new path")
+    
+    document_size = tuple(int(part) for part in args.document.lower().split('x'))
+    app = PaintApp(history_budget=int(args.history_mb * 2 ** 20), document_size=document_size,
+                   document_path=args.file)
+    app.run(replay.Recorder(args.record, replay.PAINT) if args.record else None, args.profile,
+            event_driven=not args.continuous)
\ No newline at end of file
@@ -0,0 +1,238 @@
+import mmap
+import os
+import queue
+import struct
+import threading
+import time
+import zlib
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import pygame
+
+import jobs
+import tiledcanvas
+
+# File layout: HEADER, the zlib-compressed RGB bytes of each non-blank tile,
+# then tile_count INDEX entries. Blank tiles are not stored at all.
+MAGIC = b'PTIL'
+VERSION = 1
+# magic, version, tile size, width, height, background RGB, tile count, index offset
+HEADER = struct.Struct('<4sBHII3BIQ')
+# column, row, offset, length of one stored tile
+INDEX = struct.Struct('<IIQI')
+# zlib level for tiles; level 1 is several times faster than the default and
+# only slightly larger on painted content
+LEVEL = 1
+# Seconds of a frame Saver.poll() may spend copying tiles
+POLL_BUDGET = 0.004
+# Copied tiles waiting for compression before poll() stops copying more
+BACKLOG = 64
+
+
+def _encode(data, blank):
+    """zlib bytes of one tile, or None if it is all background"""
+    if data == blank[:len(data)]:
+        return None
+    return zlib.compress(data, LEVEL)
+
+
+class Saver:
+    """Write a TiledCanvas to path without stopping the caller's frame loop.
+
+    The file is a snapshot of the canvas as it was when the Saver was made.
+    poll() copies tiles on the calling thread for at most budget seconds per
+    call, worker threads compress them, and a writer thread streams them to
+    path + '.tmp', which replaces path once complete. A tile about to be drawn
+    on before poll() reached it is copied first (the canvas calls preserve()),
+    so drawing can go on during the save. Tiles of an opened file that were
+    never decoded are written back without recompressing. If png_path is
+    given a PNG is exported from the saved file afterwards, also in the
+    background.
+    """
+
+    def __init__(self, canvas, path, png_path=None, workers=None):
+        self.canvas = canvas
+        self.path = path
+        self.png_path = png_path
+        self.header = (canvas.tile, canvas.width, canvas.height, *canvas.background[:3])
+        self.blank = bytes(canvas.background[:3]) * (canvas.tile * canvas.tile)
+        keys = sorted(canvas.keys(), key=lambda key: (key[1], key[0]))
+        self.order = deque(keys)
+        self.uncopied = set(keys)
+        self.tiles = len(keys)
+        self.written = 0
+        self.cancelled = False
+        self.error = None
+        self.done = threading.Event()
+        self.started = time.perf_counter()
+        self.elapsed = None
+        self.pool = ThreadPoolExecutor(workers or os.cpu_count())
+        self.queue = queue.Queue()
+        canvas.saving = self
+        threading.Thread(target=self._write, daemon=True).start()
+        self._detach()
+
+    def preserve(self, key):
+        """Copy a tile that is about to change if the save still needs it"""
+        if key in self.uncopied:
+            self._copy(key)
+
+    def _copy(self, key):
+        self.uncopied.discard(key)
+        canvas = self.canvas
+        if key in canvas.stored:
+            offset, length = canvas.stored[key]
+            future = Future()
+            future.set_result(canvas.store[offset:offset + length])
+        else:
+            future = self.pool.submit(_encode, canvas.tile_bytes(key), self.blank)
+        self.queue.put((key, future))
+
+    def _detach(self):
+        if not self.order and self.canvas.saving is self:
+            self.canvas.saving = None
+            self.queue.put(None)
+
+    def poll(self, budget=POLL_BUDGET):
+        """Copy tiles for up to budget seconds; return True once the save has finished"""
+        if self.done.is_set():
+            # Finished, or the writer failed part way: nothing more to copy
+            self.order.clear()
+            self.uncopied.clear()
+            self._detach()
+            self.pool.shutdown(wait=False)
+            return True
+        deadline = time.perf_counter() + budget
+        while self.order and self.queue.qsize() < BACKLOG:
+            key = self.order.popleft()
+            if key in self.uncopied:
+                self._copy(key)
+                if time.perf_counter() > deadline:
+                    break
+        self._detach()
+        return False
+
+    def cancel(self):
+        """Stop copying tiles and discard the partly written file; path is left as it was"""
+        self.cancelled = True
+        self.order.clear()
+        self.uncopied.clear()
+        self._detach()
+
+    def progress(self):
+        """Fraction of the tiles written so far"""
+        return self.written / self.tiles if self.tiles else float(self.done.is_set())
+
+    def wait(self):
+        """Block until the save has finished; raise its error if it failed"""
+        while not self.poll(budget=1):
+            self.done.wait(0.001)
+        if self.error:
+            raise self.error
+
+    def _write(self):
+        temporary = self.path + '.tmp'
+        try:
+            index = []
+            with open(temporary, 'wb') as f:
+                f.write(bytes(HEADER.size))
+                offset = HEADER.size
+                while True:
+                    item = self.queue.get()
+                    if item is None:
+                        break
+                    key, future = item
+                    data = future.result()
+                    self.written += 1
+                    if data is not None:
+                        f.write(data)
+                        index.append(INDEX.pack(*key, offset, len(data)))
+                        offset += len(data)
+                if self.cancelled:
+                    raise jobs.Cancelled
+                f.write(b''.join(index))
+                f.seek(0)
+                f.write(HEADER.pack(MAGIC, VERSION, *self.header, len(index), offset))
+            os.replace(temporary, self.path)
+            if self.png_path:
+                canvas = load(self.path)
+                export_png(canvas, self.png_path)
+                canvas.close()
+        except Exception as error:
+            if not self.cancelled:
+                self.error = error
+            if os.path.exists(temporary):
+                os.remove(temporary)
+        finally:
+            self.elapsed = time.perf_counter() - self.started
+            self.done.set()
+
+
+def save(canvas, path, png_path=None):
+    """Write canvas to path (and a PNG to png_path), blocking until done"""
+    Saver(canvas, path, png_path).wait()
+
+
+def load(path, max_resident=tiledcanvas.RESIDENT_TILES):
+    """Open a file written by save() as a TiledCanvas.
+
+    The file is memory-mapped and only its index is read here; each tile is
+    decoded the first time it is drawn, rendered or read.
+    """
+    with open(path, 'rb') as f:
+        store = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, version, tile, width, height, *background, count, index_offset = HEADER.unpack_from(store)
+    if magic != MAGIC or version != VERSION:
+        store.close()
+        raise ValueError(f"{path} is not a version {VERSION} paint document")
+    if index_offset + count * INDEX.size > len(store):
+        store.close()
+        raise ValueError(f"{path} is truncated")
+    canvas = tiledcanvas.TiledCanvas(width, height, tuple(background), tile, max_resident)
+    canvas.store = store
+    for column, row, offset, length in INDEX.iter_unpack(store[index_offset:index_offset + count * INDEX.size]):
+        canvas.stored[column, row] = (offset, length)
+    return canvas
+
+
+def _png_chunk(f, kind, data):
+    f.write(struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data)))
+
+
+def export_png(canvas, path, level=6):
+    """Write canvas as an RGB PNG one tile row at a time, never holding the whole image"""
+    width = canvas.get_width()
+    stride = width * 3
+    compressor = zlib.compressobj(level)
+    with open(path, 'wb') as f:
+        f.write(b'\x89PNG\r\n\x1a\n')
+        _png_chunk(f, b'IHDR', struct.pack('>IIBBBBB', width, canvas.get_height(), 8, 2, 0, 0, 0))
+        for strip in canvas.strips():
+            data = pygame.image.tobytes(strip, 'RGB')
+            # Every scanline starts with filter type 0 (none)
+            rows = b''.join(b'\0' + data[i:i + stride] for i in range(0, len(data), stride))
+            compressed = compressor.compress(rows)
+            if compressed:
+                _png_chunk(f, b'IDAT', compressed)
+        _png_chunk(f, b'IDAT', compressor.flush())
+        _png_chunk(f, b'IEND', b'')
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Inspect or export paint documents")
+    parser.add_argument('path', help="document written by paint.py")
+    parser.add_argument('--png', metavar='PATH', help="export the document as PNG")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    canvas = load(args.path)
+    opened = time.perf_counter() - start
+    print(f"{args.path}: {canvas.width}x{canvas.height}, {len(canvas.stored)} stored tiles "
+          f"of {canvas.columns * canvas.rows}, opened in {opened * 1000:.2f} ms")
+    if args.png:
+        start = time.perf_counter()
+        export_png(canvas, args.png)
+        print(f"exported {args.png} in {time.perf_counter() - start:.2f}s")
+    canvas.close()
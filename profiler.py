@@ -0,0 +1,168 @@
+import csv
+import json
+from array import array
+from time import perf_counter
+
+import pygame
+
+import textcache
+
+# Frames kept in the ring buffers (10 seconds at 60 fps)
+HISTORY = 600
+# A frame interval longer than this many budgets counts as a dropped frame
+DROP_FACTOR = 1.5
+# Frames between overlay text refreshes
+OVERLAY_REFRESH = 15
+
+OVERLAY_BACKGROUND = (0, 0, 0, 170)
+OVERLAY_TEXT = (255, 255, 255)
+OVERLAY_WARN = (255, 80, 80)
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted sequence"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(fraction * len(sorted_values)))
+    return sorted_values[index]
+
+
+class FrameProfiler:
+    """High-resolution per-phase frame timer with ring-buffered statistics.
+
+    Call begin_frame() at the top of a main loop iteration, mark(name) after
+    each phase, and end_frame() once the frame is presented. The interval
+    between end_frame() calls (including time spent sleeping in clock.tick) is
+    recorded alongside the phases, so dropped frames are measured against the
+    target FPS rather than against work time.
+    """
+
+    def __init__(self, phases, target_fps, history=HISTORY):
+        self.phases = tuple(phases)
+        self.target_fps = target_fps
+        self.budget = 1.0 / target_fps
+        self.history = history
+        self.columns = self.phases + ('frame',)
+        self.samples = [array('d', bytes(8 * history)) for _ in self.columns]
+        self.current = [0.0] * len(self.phases)
+        self.phase_index = {name: i for i, name in enumerate(self.phases)}
+        self.index = 0
+        self.count = 0
+        self.frames = 0
+        self.dropped = 0
+        self.frame_start = self.last_mark = perf_counter()
+        self.overlay_visible = False
+        self.overlay = None
+
+    def begin_frame(self):
+        """Start timing phases (time before this, e.g. clock.tick sleep, is not a phase)"""
+        self.last_mark = perf_counter()
+
+    def mark(self, name):
+        """Charge the time since the previous mark to phase name"""
+        now = perf_counter()
+        self.current[self.phase_index[name]] += now - self.last_mark
+        self.last_mark = now
+
+    def set_target_fps(self, target_fps):
+        """Change the frame budget (snake speeds up with its level)"""
+        self.target_fps = target_fps
+        self.budget = 1.0 / target_fps
+
+    def end_frame(self):
+        """Close the current frame and push its timings into the ring buffers"""
+        now = perf_counter()
+        interval = now - self.frame_start
+        self.frame_start = self.last_mark = now
+        index = self.index
+        current = self.current
+        for column, value in zip(self.samples, current):
+            column[index] = value
+        self.samples[-1][index] = interval
+        for i in range(len(current)):
+            current[i] = 0.0
+        self.index = (index + 1) % self.history
+        self.count = min(self.count + 1, self.history)
+        self.frames += 1
+        if self.frames > 1 and interval > self.budget * DROP_FACTOR:
+            self.dropped += 1
+        if self.overlay_visible and self.frames % OVERLAY_REFRESH == 0:
+            self.overlay = None
+
+    def _window(self, column):
+        """Samples of one column in the ring, oldest first"""
+        values = self.samples[column]
+        if self.count < self.history:
+            return values[:self.count]
+        return values[self.index:] + values[:self.index]
+
+    def stats(self):
+        """Return p50/p95/p99/mean (seconds) per phase plus frame-drop counters"""
+        result = {
+            'target_fps': self.target_fps,
+            'frames': self.frames,
+            'dropped_frames': self.dropped,
+            'phases': {},
+        }
+        for column, name in enumerate(self.columns):
+            values = sorted(self._window(column))
+            result['phases'][name] = {
+                'p50': percentile(values, 0.50),
+                'p95': percentile(values, 0.95),
+                'p99': percentile(values, 0.99),
+                'mean': sum(values) / len(values) if values else 0.0,
+            }
+        frame = result['phases']['frame']
+        result['fps'] = 1.0 / frame['mean'] if frame['mean'] else 0.0
+        return result
+
+    def toggle_overlay(self):
+        """Show or hide the on-screen statistics"""
+        self.overlay_visible = not self.overlay_visible
+        self.overlay = None
+
+    def _build_overlay(self):
+        stats = self.stats()
+        font = textcache.get_font('couriernew', 14)
+        lines = [(f"{stats['fps']:5.1f} fps  dropped {stats['dropped_frames']}/{stats['frames']}",
+                  OVERLAY_WARN if stats['dropped_frames'] else OVERLAY_TEXT),
+                 ("phase     p50    p95    p99 ms", OVERLAY_TEXT)]
+        for name, phase in stats['phases'].items():
+            color = OVERLAY_WARN if phase['p95'] > self.budget else OVERLAY_TEXT
+            lines.append((f"{name:<7}{phase['p50'] * 1000:6.2f} {phase['p95'] * 1000:6.2f} "
+                          f"{phase['p99'] * 1000:6.2f}", color))
+        # Values change every refresh, so render directly instead of filling the shared cache
+        rendered = [font.render(text, True, color) for text, color in lines]
+        width = max(surface.get_width() for surface in rendered) + 10
+        line_height = font.get_linesize()
+        overlay = pygame.Surface((width, line_height * len(rendered) + 10), pygame.SRCALPHA)
+        overlay.fill(OVERLAY_BACKGROUND)
+        for i, surface in enumerate(rendered):
+            overlay.blit(surface, (5, 5 + i * line_height))
+        return overlay
+
+    def draw_overlay(self, surface, pos=None):
+        """Blit the overlay (if visible); return the rect it covered or None"""
+        if not self.overlay_visible:
+            return None
+        if self.overlay is None:
+            self.overlay = self._build_overlay()
+        if pos is None:
+            pos = (surface.get_width() - self.overlay.get_width() - 10,
+                   surface.get_height() - self.overlay.get_height() - 10)
+        return surface.blit(self.overlay, pos)
+
+    def export(self, path):
+        """Write statistics as JSON, or the per-frame ring as CSV (by extension)"""
+        if path.endswith('.csv'):
+            rows = zip(*(self._window(column) for column in range(len(self.columns))))
+            with open(path, 'w', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow([f"{name}_ms" for name in self.columns])
+                for row in rows:
+                    writer.writerow([f"{value * 1000:.4f}" for value in row])
+        else:
+            stats = self.stats()
+            stats['text_cache'] = textcache.stats()
+            with open(path, 'w') as f:
+                json.dump(stats, f, indent=2)
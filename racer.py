@@ -3,6 +3,12 @@ import random
 import sys
 from pygame.locals import *
 
+import profiler
+import replay
+import spatial
+import spritepool
+import textcache
+
 # Initialize pygame
 pygame.init()
 
@@ -13,8 +19,16 @@ ROAD_WIDTH = 400
 CAR_WIDTH = 50
 CAR_HEIGHT = 100
 COIN_SIZE = 30
+CAR_SPEED = 5
 FPS = 60
 
+# Spawn and speed ranges (inclusive, as passed to randint)
+OBSTACLE_SPAWN_INTERVAL = (60, 120)
+COIN_SPAWN_INTERVAL = (90, 180)
+OBSTACLE_SPEED = (3, 8)
+COIN_SPEED = (2, 5)
+COIN_SPAWN_Y = (-1000, -COIN_SIZE)
+
 # Colors (all defined now)
 BLACK = (0, 0, 0)
 WHITE = (255, 255, 255)
@@ -24,6 +38,35 @@ YELLOW = (255, 255, 0)
 RED = (255, 0, 0)
 BLUE = (0, 0, 255)  # Added missing color definition
 
+# Input bits for injected (headless) key state
+INPUT_LEFT = 1
+INPUT_RIGHT = 2
+INPUT_UP = 4
+INPUT_DOWN = 8
+
+class InputState:
+    """Injected key state, indexable like pygame.key.get_pressed()"""
+    __slots__ = ('mask',)
+
+    KEY_BITS = {K_LEFT: INPUT_LEFT, K_RIGHT: INPUT_RIGHT, K_UP: INPUT_UP, K_DOWN: INPUT_DOWN}
+
+    def __init__(self, mask=0):
+        self.mask = mask
+
+    def __getitem__(self, key):
+        return bool(self.mask & self.KEY_BITS.get(key, 0))
+
+    @classmethod
+    def from_keys(cls, keys):
+        """Build an input state from a pygame.key.get_pressed() snapshot"""
+        mask = 0
+        for key, bit in cls.KEY_BITS.items():
+            if keys[key]:
+                mask |= bit
+        return cls(mask)
+
+NO_INPUT = InputState()
+
 class Car(pygame.sprite.Sprite):
     """Player's car class"""
     def __init__(self):
@@ -32,11 +75,12 @@ class Car(pygame.sprite.Sprite):
         self.image.fill(RED)
         self.rect = self.image.get_rect()
         self.rect.center = (SCREEN_WIDTH // 2, SCREEN_HEIGHT - CAR_HEIGHT - 20)
-        self.speed = 5
+        self.speed = CAR_SPEED
 
-    def update(self):
-        """Update car position based on key presses"""
-        keys = pygame.key.get_pressed()
+    def update(self, keys=None):
+        """Update car position based on key presses (or injected input)"""
+        if keys is None:
+            keys = pygame.key.get_pressed()
         if keys[K_LEFT] and self.rect.left > (SCREEN_WIDTH - ROAD_WIDTH) // 2:
             self.rect.x -= self.speed
         if keys[K_RIGHT] and self.rect.right < (SCREEN_WIDTH + ROAD_WIDTH) // 2:
@@ -46,62 +90,121 @@ class Car(pygame.sprite.Sprite):
         if keys[K_DOWN] and self.rect.bottom < SCREEN_HEIGHT:
             self.rect.y += self.speed
 
-class Obstacle(pygame.sprite.Sprite):
+def _obstacle_image():
+    image = pygame.Surface((CAR_WIDTH, CAR_HEIGHT))
+    image.fill(BLUE)
+    return image
+
+def _coin_image():
+    image = pygame.Surface((COIN_SIZE, COIN_SIZE), pygame.SRCALPHA)  # SRCALPHA for transparency
+    pygame.draw.circle(image, YELLOW, (COIN_SIZE//2, COIN_SIZE//2), COIN_SIZE//2)
+    return image
+
+class Obstacle(spritepool.PooledSprite):
     """Obstacle cars class"""
-    def __init__(self):
+    def __init__(self, rng=random):
         super().__init__()
-        self.image = pygame.Surface((CAR_WIDTH, CAR_HEIGHT))
-        self.image.fill(BLUE)
+        self.image = spritepool.shared_image('obstacle', _obstacle_image)
         self.rect = self.image.get_rect()
-        self.rect.x = random.randint(
+        self.reset(rng)
+
+    def reset(self, rng=random):
+        """Place the obstacle at a random lane position above the screen"""
+        self.rect.x = rng.randint(
             (SCREEN_WIDTH - ROAD_WIDTH) // 2,
             (SCREEN_WIDTH + ROAD_WIDTH) // 2 - CAR_WIDTH
         )
         self.rect.y = -CAR_HEIGHT
-        self.speed = random.randint(3, 8)
+        self.speed = rng.randint(*OBSTACLE_SPEED)
 
     def update(self):
         """Move obstacle down the screen"""
         self.rect.y += self.speed
         if self.rect.top > SCREEN_HEIGHT:
-            self.kill()
+            self.recycle()
+        else:
+            spatial.moved(self)
 
-class Coin(pygame.sprite.Sprite):
+class Coin(spritepool.PooledSprite):
     """Collectible coins class"""
-    def __init__(self):
+    def __init__(self, rng=random):
         super().__init__()
-        self.image = pygame.Surface((COIN_SIZE, COIN_SIZE), pygame.SRCALPHA)  # SRCALPHA for transparency
-        pygame.draw.circle(self.image, YELLOW, (COIN_SIZE//2, COIN_SIZE//2), COIN_SIZE//2)
+        self.image = spritepool.shared_image('coin', _coin_image)
         self.rect = self.image.get_rect()
-        self.rect.x = random.randint(
+        self.reset(rng)
+
+    def reset(self, rng=random):
+        """Place the coin at a random position above the screen"""
+        self.rect.x = rng.randint(
             (SCREEN_WIDTH - ROAD_WIDTH) // 2,
             (SCREEN_WIDTH + ROAD_WIDTH) // 2 - COIN_SIZE
         )
-        self.rect.y = random.randint(-1000, -COIN_SIZE)
-        self.speed = random.randint(2, 5)
+        self.rect.y = rng.randint(*COIN_SPAWN_Y)
+        self.speed = rng.randint(*COIN_SPEED)
 
     def update(self):
         """Move coin down the screen"""
         self.rect.y += self.speed
         if self.rect.top > SCREEN_HEIGHT:
-            self.kill()
+            self.recycle()
+        else:
+            spatial.moved(self)
+
+def build_background(convert=True):
+    """Pre-render the static grass, road and lane markings once"""
+    background = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
+    background.fill(GREEN)
+    pygame.draw.rect(background, GRAY,
+                     ((SCREEN_WIDTH - ROAD_WIDTH) // 2, 0, ROAD_WIDTH, SCREEN_HEIGHT))
+    
+    # Draw road markings
+    for y in range(0, SCREEN_HEIGHT, 40):
+        pygame.draw.rect(background, WHITE,
+                         (SCREEN_WIDTH // 2 - 5, y, 10, 20))
+    return background.convert() if convert else background
 
 class Game:
     """Main game class"""
-    def __init__(self):
-        self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-        pygame.display.set_caption("Racer Game")
+    # Difficulty knobs; override per instance to tune spawn rates
+    obstacle_interval = OBSTACLE_SPAWN_INTERVAL
+    coin_interval = COIN_SPAWN_INTERVAL
+
+    def __init__(self, headless=False, seed=None):
+        self.headless = headless
+        if headless:
+            # Offscreen target so draw() still works without a display
+            self.screen = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
+        else:
+            self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+            pygame.display.set_caption("Racer Game")
         self.clock = pygame.time.Clock()
-        self.font = pygame.font.SysFont('Arial', 24)
+        self.font = textcache.get_font('Arial', 24)
+        self.background = build_background(convert=not headless)
+        self.seed = seed
+        self.rng = random.Random(seed)
         self.running = True
+        self.profiler = profiler.FrameProfiler(('events', 'update', 'draw'), FPS)
+        
+        # Pools recycle Obstacle/Coin instances across spawns and restarts
+        self.obstacle_pool = spritepool.SpritePool(Obstacle)
+        self.coin_pool = spritepool.SpritePool(Coin)
+        self.obstacles = self.coins = ()
+        self.total_ticks = 0
+        self.reset()
+
+    def reset(self):
+        """Reset game state (the RNG keeps its stream across restarts)"""
+        for sprite in [*self.obstacles, *self.coins]:
+            sprite.recycle()
+        
         self.score = 0
         self.coins_collected = 0
         self.game_over = False
         
         # Sprite groups
-        self.all_sprites = pygame.sprite.Group()
-        self.obstacles = pygame.sprite.Group()
-        self.coins = pygame.sprite.Group()
+        self.all_sprites = pygame.sprite.RenderUpdates()
+        self.obstacles = spatial.SpatialGroup()
+        self.coins = spatial.SpatialGroup()
         
         # Create player car
         self.car = Car()
@@ -110,12 +213,17 @@ class Game:
         # Timers for spawning objects
         self.obstacle_timer = 0
         self.coin_timer = 0
+        self.ticks = 0
+        
+        # Renderer state: repaint everything on the first frame after a reset
+        self.full_redraw = True
+        self.text_rects = []
 
     def spawn_obstacles(self):
         """Spawn new obstacles at random intervals"""
         self.obstacle_timer += 1
-        if self.obstacle_timer > random.randint(60, 120):
-            new_obstacle = Obstacle()
+        if self.obstacle_timer > self.rng.randint(*self.obstacle_interval):
+            new_obstacle = self.obstacle_pool.acquire(self.rng)
             self.obstacles.add(new_obstacle)
             self.all_sprites.add(new_obstacle)
             self.obstacle_timer = 0
@@ -123,14 +231,15 @@ class Game:
     def spawn_coins(self):
         """Spawn new coins at random intervals"""
         self.coin_timer += 1
-        if self.coin_timer > random.randint(90, 180):
-            new_coin = Coin()
+        if self.coin_timer > self.rng.randint(*self.coin_interval):
+            new_coin = self.coin_pool.acquire(self.rng)
             self.coins.add(new_coin)
             self.all_sprites.add(new_coin)
             self.coin_timer = 0
 
     def handle_events(self):
-        """Handle game events"""
+        """Handle game events; return True if the game was restarted"""
+        restarted = False
         for event in pygame.event.get():
             if event.type == QUIT:
                 self.running = False
@@ -138,69 +247,153 @@ class Game:
                 if event.key == K_ESCAPE:
                     self.running = False
                 if event.key == K_r and self.game_over:
-                    self.__init__()  # Reset game
+                    self.reset()
+                    restarted = True
+                if event.key == K_F3:
+                    self.profiler.toggle_overlay()
+        return restarted
 
-    def update(self):
-        """Update game state"""
+    def update(self, keys=None):
+        """Update game state by one fixed timestep"""
         if not self.game_over:
+            self.ticks += 1
+            self.total_ticks += 1
+
             # Spawn objects
             self.spawn_obstacles()
             self.spawn_coins()
             
             # Update all sprites
-            self.all_sprites.update()
+            self.car.update(keys)
+            self.obstacles.update()
+            self.coins.update()
             
             # Check for collisions with obstacles
-            if pygame.sprite.spritecollide(self.car, self.obstacles, False):
+            if spatial.spritecollide(self.car, self.obstacles, False):
                 self.game_over = True
             
             # Check for coin collection
-            coins_hit = pygame.sprite.spritecollide(self.car, self.coins, True)
+            coins_hit = spatial.spritecollide(self.car, self.coins, False)
             for coin in coins_hit:
+                coin.recycle()
                 self.coins_collected += 1
                 self.score += 10
 
     def draw(self):
-        """Draw everything to the screen"""
-        # Draw background
-        self.screen.fill(GREEN)
-        pygame.draw.rect(self.screen, GRAY, 
-                         ((SCREEN_WIDTH - ROAD_WIDTH) // 2, 0, ROAD_WIDTH, SCREEN_HEIGHT))
+        """Draw the frame, pushing only the regions that changed"""
+        if self.full_redraw:
+            self.screen.blit(self.background, (0, 0))
+        else:
+            # Paint the static background back over last frame's sprites and text
+            self.all_sprites.clear(self.screen, self.background)
+            for rect in self.text_rects:
+                self.screen.blit(self.background, rect, rect)
         
-        # Draw road markings
-        for y in range(0, SCREEN_HEIGHT, 40):
-            pygame.draw.rect(self.screen, WHITE, 
-                             (SCREEN_WIDTH // 2 - 5, y, 10, 20))
-        
-        # Draw all sprites
-        self.all_sprites.draw(self.screen)
+        # Draw all sprites (RenderUpdates returns old and new sprite rects)
+        dirty = self.all_sprites.draw(self.screen)
+        dirty.extend(self.text_rects)
         
         # Draw score and coins counter
-        score_text = self.font.render(f"Score: {self.score}", True, WHITE)
-        coins_text = self.font.render(f"Coins: {self.coins_collected}", True, WHITE)
-        self.screen.blit(score_text, (10, 10))
-        self.screen.blit(coins_text, (SCREEN_WIDTH - 120, 10))
+        score_text = textcache.render_text(self.font, f"Score: {self.score}", True, WHITE)
+        coins_text = textcache.render_text(self.font, f"Coins: {self.coins_collected}", True, WHITE)
+        self.text_rects = [self.screen.blit(score_text, (10, 10)),
+                           self.screen.blit(coins_text, (SCREEN_WIDTH - 120, 10))]
         
         # Draw game over screen if needed
         if self.game_over:
-            game_over_text = self.font.render("GAME OVER - Press R to restart", True, RED)
-            self.screen.blit(game_over_text, 
+            game_over_text = textcache.render_text(self.font, "GAME OVER - Press R to restart", True, RED)
+            self.text_rects.append(self.screen.blit(game_over_text, 
                             (SCREEN_WIDTH // 2 - game_over_text.get_width() // 2, 
-                             SCREEN_HEIGHT // 2))
+                             SCREEN_HEIGHT // 2)))
+        
+        # Frame statistics overlay (F3)
+        overlay_rect = self.profiler.draw_overlay(self.screen)
+        if overlay_rect:
+            self.text_rects.append(overlay_rect)
+        dirty.extend(self.text_rects)
         
-        pygame.display.flip()
+        if not self.headless:
+            if self.full_redraw:
+                pygame.display.flip()
+            else:
+                pygame.display.update(dirty)
+        self.full_redraw = False
 
-    def run(self):
+    def run(self, recorder=None, profile_path=None):
         """Main game loop"""
+        profile = self.profiler
         while self.running:
             self.clock.tick(FPS)
-            self.handle_events()
-            self.update()
+            profile.begin_frame()
+            restarted = self.handle_events()
+            keys = InputState.from_keys(pygame.key.get_pressed())
+            if recorder:
+                recorder.tick(replay.encode_racer_tick(keys.mask, restarted))
+            profile.mark('events')
+            self.update(keys)
+            profile.mark('update')
             self.draw()
+            profile.mark('draw')
+            profile.end_frame()
 
+        if recorder:
+            recorder.close(replay.racer_digest(self))
+        if profile_path:
+            profile.export(profile_path)
         pygame.quit()
         sys.exit()
 
+    def pool_stats(self):
+        """Return sprite pool counters for obstacles and coins"""
+        return {
+            'obstacles': self.obstacle_pool.stats(self.total_ticks, FPS),
+            'coins': self.coin_pool.stats(self.total_ticks, FPS),
+        }
+
+    def run_headless(self, max_ticks, policy=None, render=False, stop_on_game_over=True):
+        """Step the simulation as fast as possible without a clock or display.
+
+        policy(game) returns the key state for the next tick (NO_INPUT if omitted).
+        On game over the run stops, or restarts when stop_on_game_over is False.
+        Returns the number of ticks simulated.
+        """
+        ticks = 0
+        while ticks < max_ticks:
+            if self.game_over:
+                if stop_on_game_over:
+                    break
+                self.reset()
+            self.update(policy(self) if policy else NO_INPUT)
+            if render:
+                self.draw()
+            ticks += 1
+        return ticks
+
 if __name__ == "__main__":
-    game = Game()
-    game.run()
\ No newline at end of file
+    import argparse
+    import time
+    parser = argparse.ArgumentParser(description="Racer game")
+    parser.add_argument('--headless', type=int, metavar='TICKS',
+                        help="simulate TICKS fixed timesteps without a display and report throughput")
+    parser.add_argument('--seed', type=int, help="seed for the game RNG")
+    parser.add_argument('--record', metavar='PATH', help="record the session for replay.py")
+    parser.add_argument('--profile', metavar='PATH',
+                        help="write frame timings on exit (.json summary or .csv per frame)")
+    args = parser.parse_args()
+
+    if args.headless:
+        game = Game(headless=True, seed=args.seed)
+        start = time.perf_counter()
+        ticks = game.run_headless(args.headless, stop_on_game_over=False)
+        elapsed = time.perf_counter() - start
+        print(f"{ticks} ticks in {elapsed:.3f}s ({ticks / elapsed:.0f} ticks/s), score {game.score}")
+        for kind, stats in game.pool_stats().items():
+            print(f"{kind} pool: {stats['allocated']} allocated, {stats['reused']} reused "
+                  f"({stats['avoided_per_minute']:.1f} allocations avoided per minute of play)")
+    elif args.record:
+        seed = args.seed if args.seed is not None else random.randrange(2 ** 63)
+        game = Game(seed=seed)
+        game.run(replay.Recorder(args.record, replay.RACER, seed), args.profile)
+    else:
+        game = Game(seed=args.seed)
+        game.run(profile_path=args.profile)
\ No newline at end of file
@@ -0,0 +1,159 @@
+import numpy as np
+
+from racer import (SCREEN_WIDTH, SCREEN_HEIGHT, ROAD_WIDTH, CAR_WIDTH, CAR_HEIGHT,
+                   COIN_SIZE, CAR_SPEED, OBSTACLE_SPAWN_INTERVAL, COIN_SPAWN_INTERVAL,
+                   OBSTACLE_SPEED, COIN_SPEED, COIN_SPAWN_Y,
+                   INPUT_LEFT, INPUT_RIGHT, INPUT_UP, INPUT_DOWN)
+
+# Road edges and player start (same geometry as racer.Car)
+ROAD_LEFT = (SCREEN_WIDTH - ROAD_WIDTH) // 2
+ROAD_RIGHT = (SCREEN_WIDTH + ROAD_WIDTH) // 2
+CAR_START_X = SCREEN_WIDTH // 2 - CAR_WIDTH // 2
+CAR_START_Y = SCREEN_HEIGHT - CAR_HEIGHT - 20 - CAR_HEIGHT // 2
+
+
+def _slot_capacity(spawn_y, min_speed, min_interval):
+    """Upper bound on how many sprites of one kind can be alive at once"""
+    lifetime = -(-(SCREEN_HEIGHT + 1 - spawn_y) // min_speed)  # ticks until top > SCREEN_HEIGHT
+    return -(-lifetime // (min_interval + 1)) + 1
+
+OBSTACLE_SLOTS = _slot_capacity(-CAR_HEIGHT, OBSTACLE_SPEED[0], OBSTACLE_SPAWN_INTERVAL[0])
+COIN_SLOTS = _slot_capacity(COIN_SPAWN_Y[0], COIN_SPEED[0], COIN_SPAWN_INTERVAL[0])
+
+
+class RacerBatch:
+    """N independent racer games stepped together with NumPy.
+
+    Each game follows the rules of racer.Game.update: spawn timers against a
+    fresh random threshold every tick, car movement clamped to the road, sprites
+    culled once their top passes the bottom edge, AABB collision (pygame's
+    colliderect) against obstacles and coins. Obstacles and coins live in fixed
+    slot arrays sized so they can never overflow. Randomness comes from a single
+    numpy Generator, so runs are reproducible per seed but do not share the
+    random.Random stream of racer.Game.
+    """
+
+    def __init__(self, n, seed=None):
+        self.n = n
+        self.rng = np.random.default_rng(seed)
+
+        self.car_x = np.empty(n, np.int32)
+        self.car_y = np.empty(n, np.int32)
+
+        self.obstacle_x = np.zeros((n, OBSTACLE_SLOTS), np.int32)
+        self.obstacle_y = np.zeros((n, OBSTACLE_SLOTS), np.int32)
+        self.obstacle_speed = np.zeros((n, OBSTACLE_SLOTS), np.int32)
+        self.obstacle_alive = np.zeros((n, OBSTACLE_SLOTS), bool)
+
+        self.coin_x = np.zeros((n, COIN_SLOTS), np.int32)
+        self.coin_y = np.zeros((n, COIN_SLOTS), np.int32)
+        self.coin_speed = np.zeros((n, COIN_SLOTS), np.int32)
+        self.coin_alive = np.zeros((n, COIN_SLOTS), bool)
+
+        self.obstacle_timer = np.zeros(n, np.int32)
+        self.coin_timer = np.zeros(n, np.int32)
+        self.score = np.zeros(n, np.int64)
+        self.coins_collected = np.zeros(n, np.int64)
+        self.ticks = np.zeros(n, np.int64)
+        self.game_over = np.zeros(n, bool)
+
+        self.reset()
+
+    def reset(self, mask=None):
+        """Reset the selected games (all games if mask is None)"""
+        if mask is None:
+            mask = slice(None)
+        self.car_x[mask] = CAR_START_X
+        self.car_y[mask] = CAR_START_Y
+        self.obstacle_alive[mask] = False
+        self.coin_alive[mask] = False
+        self.obstacle_timer[mask] = 0
+        self.coin_timer[mask] = 0
+        self.score[mask] = 0
+        self.coins_collected[mask] = 0
+        self.ticks[mask] = 0
+        self.game_over[mask] = False
+
+    def _spawn(self, active, timer, interval, alive, xs, ys, speeds, width, y_range, speed_range):
+        """Advance one kind of spawn timer and fill a free slot where it fires"""
+        timer[active] += 1
+        threshold = self.rng.integers(interval[0], interval[1] + 1, self.n)
+        spawn = active & (timer > threshold)
+        rows = np.flatnonzero(spawn)
+        if rows.size == 0:
+            return
+        free = ~alive[rows]
+        if not free.any(axis=1).all():
+            raise RuntimeError("sprite slots exhausted")
+        slots = free.argmax(axis=1)  # first free slot per game
+        count = rows.size
+        xs[rows, slots] = self.rng.integers(ROAD_LEFT, ROAD_RIGHT - width + 1, count)
+        ys[rows, slots] = self.rng.integers(y_range[0], y_range[1] + 1, count)
+        speeds[rows, slots] = self.rng.integers(speed_range[0], speed_range[1] + 1, count)
+        alive[rows, slots] = True
+        timer[rows] = 0
+
+    def _move_car(self, active, inputs):
+        """Apply key input with the same sequential clamping as racer.Car.update"""
+        x, y = self.car_x, self.car_y
+        x -= CAR_SPEED * (active & ((inputs & INPUT_LEFT) != 0) & (x > ROAD_LEFT))
+        x += CAR_SPEED * (active & ((inputs & INPUT_RIGHT) != 0) & (x + CAR_WIDTH < ROAD_RIGHT))
+        y -= CAR_SPEED * (active & ((inputs & INPUT_UP) != 0) & (y > 0))
+        y += CAR_SPEED * (active & ((inputs & INPUT_DOWN) != 0) & (y + CAR_HEIGHT < SCREEN_HEIGHT))
+
+    def _hits(self, alive, xs, ys, size_w, size_h):
+        """AABB overlap of every live sprite with its game's car"""
+        cx = self.car_x[:, None]
+        cy = self.car_y[:, None]
+        return (alive
+                & (xs < cx + CAR_WIDTH) & (xs + size_w > cx)
+                & (ys < cy + CAR_HEIGHT) & (ys + size_h > cy))
+
+    def step(self, inputs=0):
+        """Advance every running game by one tick.
+
+        inputs is a per-game (or scalar) bitmask of racer.INPUT_* flags.
+        Returns the game_over array.
+        """
+        active = ~self.game_over
+        inputs = np.broadcast_to(np.asarray(inputs, np.uint8), (self.n,))
+        self.ticks += active
+
+        self._spawn(active, self.obstacle_timer, OBSTACLE_SPAWN_INTERVAL, self.obstacle_alive,
+                    self.obstacle_x, self.obstacle_y, self.obstacle_speed, CAR_WIDTH,
+                    (-CAR_HEIGHT, -CAR_HEIGHT), OBSTACLE_SPEED)
+        self._spawn(active, self.coin_timer, COIN_SPAWN_INTERVAL, self.coin_alive,
+                    self.coin_x, self.coin_y, self.coin_speed, COIN_SIZE,
+                    COIN_SPAWN_Y, COIN_SPEED)
+
+        self._move_car(active, inputs)
+
+        moving = self.obstacle_alive & active[:, None]
+        self.obstacle_y += self.obstacle_speed * moving
+        self.obstacle_alive &= self.obstacle_y <= SCREEN_HEIGHT
+        moving = self.coin_alive & active[:, None]
+        self.coin_y += self.coin_speed * moving
+        self.coin_alive &= self.coin_y <= SCREEN_HEIGHT
+
+        crashed = self._hits(self.obstacle_alive, self.obstacle_x, self.obstacle_y,
+                             CAR_WIDTH, CAR_HEIGHT).any(axis=1)
+        self.game_over |= active & crashed
+
+        collected = self._hits(self.coin_alive, self.coin_x, self.coin_y, COIN_SIZE, COIN_SIZE)
+        collected &= active[:, None]
+        self.coin_alive &= ~collected
+        count = collected.sum(axis=1)
+        self.coins_collected += count
+        self.score += 10 * count
+
+        return self.game_over
+
+    def run(self, ticks, inputs=0, reset_finished=False):
+        """Step all games for a number of ticks; returns completed-episode scores"""
+        finished = []
+        for _ in range(ticks):
+            done = self.step(inputs)
+            if reset_finished and done.any():
+                finished.append(self.score[done].copy())
+                self.reset(done.copy())
+        return np.concatenate(finished) if finished else np.empty(0, np.int64)
@@ -0,0 +1,271 @@
+import hashlib
+import struct
+import sys
+import time
+import zlib
+
+import pygame
+from pygame.locals import *
+
+# File layout: header, zlib-compressed tick stream, trailer.
+#   header  = magic, format version, app id, RNG seed, board (snake) or document (paint) size
+#   racer   = 1 byte per tick: INPUT_* key mask | TICK_RESTART
+#   snake   = 1 byte per tick: index into snake.DIRECTIONS | TICK_RESTART
+#   paint   = u16 event count per tick, then 11 bytes per event
+#   trailer = magic, tick count, sha256 digest of the final state
+MAGIC = b'RPLY'
+TRAILER_MAGIC = b'END!'
+# 2: snake food is sampled from the free-cell index, 3: board size,
+# 4: paint document size and panning keys, 5: pen strokes drawn as polylines,
+# 6: 32-bit paint key codes (pygame 2 arrow and keypad keys are 0x4000xxxx)
+VERSION = 6
+HEADER = struct.Struct('<4sBBqHH')
+TRAILER = struct.Struct('<4sI32s')
+PAINT_COUNT = struct.Struct('<H')
+PAINT_EVENT = struct.Struct('<BIHhh')  # kind, button or key, mod, x, y
+
+# Application ids
+RACER = 1
+SNAKE = 2
+PAINT = 3
+APP_NAMES = {RACER: 'racer', SNAKE: 'snake', PAINT: 'paint'}
+
+TICK_RESTART = 0x10
+
+# Paint event kinds
+PAINT_EVENT_TYPES = {MOUSEBUTTONDOWN: 1, MOUSEBUTTONUP: 2, MOUSEMOTION: 3, KEYDOWN: 4}
+PAINT_EVENT_KINDS = {kind: event_type for event_type, kind in PAINT_EVENT_TYPES.items()}
+
+
+class Recorder:
+    """Collects per-tick input for one session and writes it on close"""
+
+    def __init__(self, path, app, seed=0, size=(0, 0)):
+        self.path = path
+        self.app = app
+        self.seed = seed
+        self.size = size
+        self.ticks = 0
+        self.body = bytearray()
+        self.closed = False
+
+    def tick(self, payload):
+        """Append the encoded input for one tick"""
+        self.body += payload
+        self.ticks += 1
+
+    def close(self, digest):
+        """Write the recording with the digest of the final state"""
+        if self.closed:
+            return
+        self.closed = True
+        with open(self.path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, self.app, self.seed, *self.size))
+            f.write(zlib.compress(bytes(self.body), 9))
+            f.write(TRAILER.pack(TRAILER_MAGIC, self.ticks, digest))
+
+
+class Recording:
+    """A loaded session: app id, seed, board size, raw tick stream and expected digest"""
+
+    def __init__(self, app, seed, size, ticks, body, digest):
+        self.app = app
+        self.seed = seed
+        self.size = size
+        self.ticks = ticks
+        self.body = body
+        self.digest = digest
+
+
+def load(path):
+    """Read a recording written by Recorder"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    magic, version, app, seed, width, height = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a recording")
+    if version != VERSION:
+        raise ValueError(f"{path} is a version {version} recording; this replay.py reads version {VERSION}")
+    trailer_magic, ticks, digest = TRAILER.unpack_from(data, len(data) - TRAILER.size)
+    if trailer_magic != TRAILER_MAGIC:
+        raise ValueError(f"{path} is truncated")
+    body = zlib.decompress(data[HEADER.size:len(data) - TRAILER.size])
+    return Recording(app, seed, (width, height), ticks, body, digest)
+
+
+def _digest(state):
+    return hashlib.sha256(repr(state).encode()).digest()
+
+
+def encode_racer_tick(mask, restarted):
+    return bytes((mask | (TICK_RESTART if restarted else 0),))
+
+
+def encode_snake_tick(direction, restarted):
+    import snake
+    return bytes((snake.DIRECTIONS.index(direction) | (TICK_RESTART if restarted else 0),))
+
+
+def encode_paint_tick(events):
+    """Encode the input events of one frame (anything after QUIT is dropped)"""
+    records = []
+    for event in events:
+        if event.type == QUIT:
+            break
+        kind = PAINT_EVENT_TYPES.get(event.type)
+        if kind is None:
+            continue
+        if event.type == KEYDOWN:
+            records.append(PAINT_EVENT.pack(kind, event.key, event.mod & 0xFFFF, 0, 0))
+        else:
+            x, y = event.pos
+            records.append(PAINT_EVENT.pack(kind, getattr(event, 'button', 0), 0, x, y))
+    return PAINT_COUNT.pack(len(records)) + b''.join(records)
+
+
+def racer_digest(game):
+    return _digest((game.score, game.coins_collected, game.game_over, game.ticks,
+                    tuple(game.car.rect),
+                    sorted(tuple(sprite.rect) for sprite in game.obstacles),
+                    sorted(tuple(sprite.rect) for sprite in game.coins)))
+
+
+def snake_digest(snake, food, game_over):
+    return _digest((snake.score, snake.level, snake.foods_eaten, snake.length,
+                    list(snake.positions), food.position, game_over))
+
+
+def paint_digest(canvas):
+    """sha256 of the RGB pixels, row-major, streamed one tile row at a time"""
+    digest = hashlib.sha256()
+    for strip in canvas.strips():
+        digest.update(pygame.image.tobytes(strip, 'RGB'))
+    return digest.digest()
+
+
+def replay_racer(recording):
+    """Re-run a racer session headless; return the final state digest"""
+    import racer
+    game = racer.Game(headless=True, seed=recording.seed)
+    for byte in recording.body:
+        if byte & TICK_RESTART:
+            game.reset()
+        game.update(racer.InputState(byte & ~TICK_RESTART))
+    return racer_digest(game)
+
+
+def replay_snake(recording):
+    """Re-run a snake session headless; return the final state digest"""
+    import random
+    import snake as snake_module
+    width, height = recording.size
+    snake = snake_module.Snake(width, height)
+    food = snake_module.Food(snake.positions, random.Random(recording.seed), snake.free_cells,
+                             width, height)
+    game_over = False
+    for byte in recording.body:
+        if byte & TICK_RESTART:
+            snake.reset()
+            food.randomize_position(snake.positions, snake.free_cells)
+            game_over = False
+        snake.direction = snake_module.DIRECTIONS[byte & 0x0F]
+        if not game_over:
+            game_over = snake_module.step(snake, food)
+    return snake_digest(snake, food, game_over)
+
+
+def replay_paint(recording):
+    """Re-run a paint session headless; return the canvas digest"""
+    import paint
+    app = paint.PaintApp(headless=True, document_size=recording.size)
+    body = recording.body
+    offset = 0
+    for _ in range(recording.ticks):
+        count, = PAINT_COUNT.unpack_from(body, offset)
+        offset += PAINT_COUNT.size
+        events = []
+        for _ in range(count):
+            kind, code, mod, x, y = PAINT_EVENT.unpack_from(body, offset)
+            offset += PAINT_EVENT.size
+            event_type = PAINT_EVENT_KINDS[kind]
+            if event_type == KEYDOWN:
+                events.append(pygame.event.Event(KEYDOWN, key=code, mod=mod))
+            elif event_type == MOUSEMOTION:
+                events.append(pygame.event.Event(MOUSEMOTION, pos=(x, y)))
+            else:
+                events.append(pygame.event.Event(event_type, pos=(x, y), button=code))
+        if app.jobs.active():
+            app.poll_jobs()
+        app.handle_events(events)
+        app.flush_stroke()
+    return paint_digest(app.canvas)
+
+
+REPLAYERS = {RACER: replay_racer, SNAKE: replay_snake, PAINT: replay_paint}
+
+
+def replay(path):
+    """Replay a recording as fast as possible; return (matches, recording, seconds)"""
+    recording = load(path)
+    start = time.perf_counter()
+    digest = REPLAYERS[recording.app](recording)
+    elapsed = time.perf_counter() - start
+    return digest == recording.digest, recording, elapsed
+
+
+def check_paint_keys(path):
+    """Record a headless paint session that pans and zooms with the keyboard, then replay it.
+
+    Arrow and keypad keys have codes above 16 bits in pygame 2, and each
+    moves the document under later mouse positions, so a lost key shows as
+    a digest mismatch. Returns replay(path).
+    """
+    import paint
+    app = paint.PaintApp(headless=True, document_size=(2400, 1800))
+    recorder = Recorder(path, PAINT, size=app.canvas.get_size())
+    keys = [K_RIGHT, K_RIGHT, K_RIGHT, K_DOWN, K_KP_PLUS, K_KP_MINUS, K_KP_MINUS]
+    frames = [[pygame.event.Event(KEYDOWN, key=key, mod=0)] for key in keys]
+    frames += [[pygame.event.Event(MOUSEBUTTONDOWN, pos=(300, 300), button=1)],
+               [pygame.event.Event(MOUSEMOTION, pos=(500, 400))],
+               [pygame.event.Event(MOUSEBUTTONUP, pos=(500, 400), button=1)]]
+    for events in frames:
+        recorder.tick(encode_paint_tick(events))
+        app.handle_events(events)
+        app.flush_stroke()
+    recorder.close(paint_digest(app.canvas))
+    return replay(path)
+
+
+def main(argv):
+    if len(argv) < 2:
+        print("usage: python replay.py RECORDING [RECORDING ...] | --check-keys")
+        return 2
+    if argv[1] == '--check-keys':
+        import os
+        import tempfile
+        handle, path = tempfile.mkstemp(suffix='.rpl')
+        os.close(handle)
+        try:
+            ok, recording, _ = check_paint_keys(path)
+        finally:
+            os.remove(path)
+        print(f"paint key round trip: {recording.ticks} ticks {'OK' if ok else 'MISMATCH'}")
+        return 0 if ok else 1
+    failed = 0
+    for path in argv[1:]:
+        try:
+            ok, recording, elapsed = replay(path)
+        except ValueError as error:
+            print(error)
+            failed += 1
+            continue
+        rate = recording.ticks / elapsed if elapsed else float('inf')
+        print(f"{path}: {APP_NAMES[recording.app]} seed={recording.seed} "
+              f"{recording.ticks} ticks in {elapsed:.3f}s ({rate:.0f} ticks/s) "
+              f"{'OK' if ok else 'MISMATCH'}")
+        failed += not ok
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -1,8 +1,15 @@
 import pygame
 import random
 import sys
+from array import array
+from collections import deque
+from heapq import heappop, heappush
 from pygame.locals import *
 
+import profiler
+import replay
+import textcache
+
 # Initialize pygame
 pygame.init()
 
@@ -27,11 +34,61 @@ UP = (0, -1)
 DOWN = (0, 1)
 LEFT = (-1, 0)
 RIGHT = (1, 0)
+DIRECTIONS = (UP, DOWN, LEFT, RIGHT)
+
+class FreeCells:
+    """Set of free grid cells with O(1) add, remove and uniform sampling.
+
+    cells[:count] holds the free cells in arbitrary order and slots maps each
+    cell to its index there (-1 when occupied), so removal swaps the last free
+    cell into the hole.
+    """
+    def __init__(self, size):
+        self.cells = array('i', range(size))
+        self.slots = array('i', range(size))
+        self.count = size
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, cell):
+        return self.slots[cell] >= 0
+
+    def remove(self, cell):
+        """Mark a free cell as occupied"""
+        slot = self.slots[cell]
+        self.count -= 1
+        last = self.cells[self.count]
+        self.cells[slot] = last
+        self.slots[last] = slot
+        self.slots[cell] = -1
+
+    def add(self, cell):
+        """Mark an occupied cell as free"""
+        self.cells[self.count] = cell
+        self.slots[cell] = self.count
+        self.count += 1
+
+    def sample(self, rng):
+        """Return a uniformly random free cell"""
+        return self.cells[rng.randrange(self.count)]
 
 class Snake:
-    def __init__(self):
+    """The snake on a width x height torus (the window-sized grid by default).
+
+    Per-board memory is 9 bytes a cell: the occupancy grid (1 byte) and the
+    FreeCells index (two 4-byte ids), about 36 MB for 2000x2000. The body deque
+    adds roughly 100 bytes per segment.
+    """
+    def __init__(self, width=GRID_WIDTH, height=GRID_HEIGHT):
         """Initialize the snake with starting position and length"""
-        self.positions = [(GRID_WIDTH // 2, GRID_HEIGHT // 2)]
+        self.width = width
+        self.height = height
+        # Body segments per grid cell (row-major), kept in sync with positions
+        self.occupied = bytearray(width * height)
+        self.free_cells = FreeCells(width * height)
+        self.positions = deque()
+        self.set_body([(width // 2, height // 2)])
         self.length = 1
         self.direction = RIGHT
         self.color = GREEN
@@ -39,6 +96,23 @@ class Snake:
         self.level = 1
         self.foods_eaten = 0
         self.foods_to_next_level = 3  # Foods needed to advance to next level
+        self.last_tail = None  # Cell dropped from the tail by the last update
+
+    def set_body(self, cells):
+        """Replace the body with cells (head first), rebuilding the occupancy grid"""
+        occupied = self.occupied
+        free_cells = self.free_cells
+        for x, y in self.positions:
+            cell = y * self.width + x
+            if occupied[cell]:
+                occupied[cell] = 0
+                free_cells.add(cell)
+        self.positions = deque(cells)
+        for x, y in self.positions:
+            cell = y * self.width + x
+            if not occupied[cell]:
+                free_cells.remove(cell)
+            occupied[cell] += 1
 
     def get_head_position(self):
         """Return the position of the snake's head"""
@@ -48,26 +122,39 @@ class Snake:
         """Update the snake's position based on current direction"""
         head_x, head_y = self.get_head_position()
         dir_x, dir_y = self.direction
-        new_x = (head_x + dir_x) % GRID_WIDTH
-        new_y = (head_y + dir_y) % GRID_HEIGHT
+        self.last_tail = None
+        width = self.width
+        new_x = (head_x + dir_x) % width
+        new_y = (head_y + dir_y) % self.height
         
         # Check for wall collision (game over if hits wall)
-        if new_x < 0 or new_x >= GRID_WIDTH or new_y < 0 or new_y >= GRID_HEIGHT:
+        if new_x < 0 or new_x >= width or new_y < 0 or new_y >= self.height:
             return True  # Game over
         
-        # Check for self collision
-        if (new_x, new_y) in self.positions[:-1]:
+        # Check for self collision; the tail cell is free unless another segment shares it
+        positions = self.positions
+        occupied = self.occupied
+        cell = new_y * width + new_x
+        count = occupied[cell]
+        if count and (count > 1 or positions[-1] != (new_x, new_y)):
             return True  # Game over
         
-        self.positions.insert(0, (new_x, new_y))
-        if len(self.positions) > self.length:
-            self.positions.pop()
+        positions.appendleft((new_x, new_y))
+        if not count:
+            self.free_cells.remove(cell)
+        occupied[cell] = count + 1
+        if len(positions) > self.length:
+            tail_x, tail_y = self.last_tail = positions.pop()
+            tail = tail_y * width + tail_x
+            occupied[tail] -= 1
+            if not occupied[tail]:
+                self.free_cells.add(tail)
         
         return False  # Game continues
 
     def reset(self):
         """Reset the snake to initial state"""
-        self.positions = [(GRID_WIDTH // 2, GRID_HEIGHT // 2)]
+        self.set_body([(self.width // 2, self.height // 2)])
         self.length = 1
         self.direction = RIGHT
         self.score = 0
@@ -77,29 +164,56 @@ class Snake:
     def render(self, surface):
         """Draw the snake on the game surface"""
         for position in self.positions:
-            rect = pygame.Rect((position[0] * GRID_SIZE, position[1] * GRID_SIZE), (GRID_SIZE, GRID_SIZE))
-            pygame.draw.rect(surface, self.color, rect)
-            pygame.draw.rect(surface, BLACK, rect, 1)  # Border
+            draw_cell(surface, position, self.color)
 
 class Food:
-    def __init__(self, snake_positions):
+    def __init__(self, snake_positions, rng=random, free_cells=None, width=GRID_WIDTH, height=GRID_HEIGHT):
         """Initialize food at a random position not occupied by snake"""
         self.position = (0, 0)
         self.color = RED
-        self.randomize_position(snake_positions)
+        self.rng = rng
+        self.width = width
+        self.height = height
+        self.randomize_position(snake_positions, free_cells)
+
+    def randomize_position(self, snake_positions, free_cells=None):
+        """Generate random position for food that doesn't overlap with snake.
 
-    def randomize_position(self, snake_positions):
-        """Generate random position for food that doesn't overlap with snake"""
+        With the snake's FreeCells index this is O(1); otherwise it falls back
+        to rejection sampling. Returns False (position None) if the board is full.
+        """
+        if free_cells is not None:
+            if not free_cells:
+                self.position = None
+                return False
+            cell = free_cells.sample(self.rng)
+            self.position = (cell % self.width, cell // self.width)
+            return True
+        
+        if len(set(snake_positions)) >= self.width * self.height:
+            self.position = None
+            return False
         while True:
-            self.position = (random.randint(0, GRID_WIDTH - 1), random.randint(0, GRID_HEIGHT - 1))
+            self.position = (self.rng.randint(0, self.width - 1), self.rng.randint(0, self.height - 1))
             if self.position not in snake_positions:
-                break
+                return True
 
     def render(self, surface):
         """Draw the food on the game surface"""
-        rect = pygame.Rect((self.position[0] * GRID_SIZE, self.position[1] * GRID_SIZE), (GRID_SIZE, GRID_SIZE))
-        pygame.draw.rect(surface, self.color, rect)
-        pygame.draw.rect(surface, BLACK, rect, 1)  # Border
+        if self.position is None:
+            return
+        draw_cell(surface, self.position, self.color)
+
+def cell_rect(position):
+    """Screen rect of a grid cell"""
+    return pygame.Rect((position[0] * GRID_SIZE, position[1] * GRID_SIZE), (GRID_SIZE, GRID_SIZE))
+
+def draw_cell(surface, position, color):
+    """Fill one grid cell with a bordered square; return its rect"""
+    rect = cell_rect(position)
+    pygame.draw.rect(surface, color, rect)
+    pygame.draw.rect(surface, BLACK, rect, 1)  # Border
+    return rect
 
 def draw_grid(surface):
     """Draw grid lines on the game surface"""
@@ -108,13 +222,13 @@ def draw_grid(surface):
             rect = pygame.Rect((x, y), (GRID_SIZE, GRID_SIZE))
             pygame.draw.rect(surface, GRAY, rect, 1)
 
-def show_game_over(surface, score, level):
+def show_game_over(surface, score, level, won=False):
     """Display game over screen with final score and level"""
-    font = pygame.font.SysFont('arial', 36)
-    game_over_text = font.render("GAME OVER", True, RED)
-    score_text = font.render(f"Score: {score}", True, WHITE)
-    level_text = font.render(f"Level: {level}", True, WHITE)
-    restart_text = font.render("Press R to restart", True, WHITE)
+    font = textcache.get_font('arial', 36)
+    game_over_text = textcache.render_text(font, "YOU WIN" if won else "GAME OVER", True, GREEN if won else RED)
+    score_text = textcache.render_text(font, f"Score: {score}", True, WHITE)
+    level_text = textcache.render_text(font, f"Level: {level}", True, WHITE)
+    restart_text = textcache.render_text(font, "Press R to restart", True, WHITE)
     
     surface.blit(game_over_text, (WINDOW_WIDTH // 2 - game_over_text.get_width() // 2, WINDOW_HEIGHT // 2 - 60))
     surface.blit(score_text, (WINDOW_WIDTH // 2 - score_text.get_width() // 2, WINDOW_HEIGHT // 2))
@@ -123,38 +237,415 @@ def show_game_over(surface, score, level):
 
 def show_score(surface, score, level):
     """Display current score and level during gameplay"""
-    font = pygame.font.SysFont('arial', 20)
-    score_text = font.render(f"Score: {score}", True, WHITE)
-    level_text = font.render(f"Level: {level}", True, WHITE)
-    surface.blit(score_text, (10, 10))
-    surface.blit(level_text, (10, 30))
-
-def main():
-    """Main game function"""
+    font = textcache.get_font('arial', 20)
+    score_text = textcache.render_text(font, f"Score: {score}", True, WHITE)
+    level_text = textcache.render_text(font, f"Level: {level}", True, WHITE)
+    return surface.blit(score_text, (10, 10)).union(surface.blit(level_text, (10, 30)))
+
+class SnakeRenderer:
+    """Incremental board renderer on top of a pre-rendered grid.
+
+    Between ticks only the new head cell, the freed tail cell and a respawned
+    food cell change, so draw() repaints just those (plus the score text when
+    it changes or gets painted over) and returns the rects to push with
+    pygame.display.update(). invalidate() forces a full redraw, e.g. after a
+    reset or level-up.
+    """
+    def __init__(self, surface):
+        self.surface = surface
+        self.background = pygame.Surface(surface.get_size())
+        self.background.fill(BLACK)
+        draw_grid(self.background)
+        self.full_redraw = True
+        self.score_rect = None
+        self.shown_score = None
+        self.food_position = None
+
+    def invalidate(self):
+        """Redraw everything on the next draw()"""
+        self.full_redraw = True
+
+    def restore(self, rect, snake, food):
+        """Repaint the board under rect (grid, body, food); return the cell-aligned rect"""
+        left = max(rect.left // GRID_SIZE, 0)
+        top = max(rect.top // GRID_SIZE, 0)
+        right = min((rect.right - 1) // GRID_SIZE, snake.width - 1)
+        bottom = min((rect.bottom - 1) // GRID_SIZE, snake.height - 1)
+        area = pygame.Rect(left * GRID_SIZE, top * GRID_SIZE,
+                           (right - left + 1) * GRID_SIZE, (bottom - top + 1) * GRID_SIZE)
+        self.surface.blit(self.background, area, area)
+        occupied = snake.occupied
+        for y in range(top, bottom + 1):
+            row = y * snake.width
+            for x in range(left, right + 1):
+                if occupied[row + x]:
+                    draw_cell(self.surface, (x, y), snake.color)
+        if food.position is not None and area.collidepoint(cell_rect(food.position).topleft):
+            draw_cell(self.surface, food.position, food.color)
+        if self.score_rect and area.colliderect(self.score_rect):
+            self.shown_score = None  # text was painted over
+        return area
+
+    def draw(self, snake, food):
+        """Bring the surface up to date; return the list of changed rects"""
+        surface = self.surface
+        score = (snake.score, snake.level)
+        if self.full_redraw:
+            surface.blit(self.background, (0, 0))
+            snake.render(surface)
+            food.render(surface)
+            self.score_rect = show_score(surface, snake.score, snake.level)
+            self.shown_score = score
+            self.food_position = food.position
+            self.full_redraw = False
+            return [surface.get_rect()]
+
+        dirty = []
+        tail = snake.last_tail
+        if tail is not None and not snake.occupied[tail[1] * snake.width + tail[0]]:
+            dirty.append(surface.blit(self.background, cell_rect(tail), cell_rect(tail)))
+        dirty.append(draw_cell(surface, snake.get_head_position(), snake.color))
+        if food.position != self.food_position:
+            self.food_position = food.position
+            if food.position is not None:
+                dirty.append(draw_cell(surface, food.position, food.color))
+        
+        # Score text sits on the board: redraw it if it changed or was painted over
+        if score != self.shown_score or self.score_rect.collidelist(dirty) != -1:
+            area = self.restore(self.score_rect, snake, food)
+            self.score_rect = show_score(surface, snake.score, snake.level)
+            dirty.append(area.union(self.score_rect))
+            self.shown_score = score
+        return dirty
+
+class CameraRenderer:
+    """Renders a window-sized view of a board larger than the window.
+
+    The camera keeps the head centred, wrapping around the torus like the
+    snake does; along an axis where the board is smaller than the window it
+    repeats, so a 10x100 board shows side by side copies. Each frame touches only the visible cells: rows of the
+    occupancy grid are sliced per view row and skipped when empty, so the cost
+    depends on the window size, not on the board area or the snake's length.
+    It has the same draw/invalidate/restore interface as SnakeRenderer.
+    """
+    def __init__(self, surface):
+        self.surface = surface
+        self.columns = surface.get_width() // GRID_SIZE
+        self.rows = surface.get_height() // GRID_SIZE
+        self.background = pygame.Surface(surface.get_size())
+        self.background.fill(BLACK)
+        draw_grid(self.background)
+        self.origin = (0, 0)
+
+    def invalidate(self):
+        """Every draw() is a full redraw of the view"""
+
+    def restore(self, rect, snake, food):
+        """Every draw() repaints the whole view, so there is nothing to restore"""
+        return rect
+
+    def _row(self, occupied, start, left, width):
+        """The view's slice of one board row, wrapping at the right edge"""
+        right = left + self.columns
+        if right <= width:
+            return occupied[start + left:start + right]
+        if self.columns <= width:
+            return occupied[start + left:start + width] + occupied[start:start + right - width]
+        # A board narrower than the view repeats across it, as rows do below
+        return [occupied[start + (left + i) % width] for i in range(self.columns)]
+
+    def draw(self, snake, food):
+        """Draw the view around the head; return the changed rects"""
+        surface = self.surface
+        width, height = snake.width, snake.height
+        head_x, head_y = snake.get_head_position()
+        left = (head_x - self.columns // 2) % width
+        top = (head_y - self.rows // 2) % height
+        self.origin = (left, top)
+        surface.blit(self.background, (0, 0))
+        
+        occupied = snake.occupied
+        columns = self.columns
+        for j in range(self.rows):
+            row = self._row(occupied, (top + j) % height * width, left, width)
+            if row.count(0) == columns:
+                continue
+            for i, count in enumerate(row):
+                if count:
+                    draw_cell(surface, (i, j), snake.color)
+        
+        if food.position is not None:
+            for y in range((food.position[1] - top) % height, self.rows, height):
+                for x in range((food.position[0] - left) % width, columns, width):
+                    draw_cell(surface, (x, y), food.color)
+        show_score(surface, snake.score, snake.level)
+        return [surface.get_rect()]
+
+def step(snake, food):
+    """Advance the game by one tick; return True when the game is over"""
+    # Update snake position
+    if snake.update():
+        return True
+    
+    # Check if snake ate food
+    if snake.get_head_position() == food.position:
+        snake.length += 1
+        snake.score += 10
+        snake.foods_eaten += 1
+        if not food.randomize_position(snake.positions, snake.free_cells):
+            return True  # Board is full: the player has won
+        
+        # Check for level up
+        if snake.foods_eaten >= snake.foods_to_next_level:
+            snake.level += 1
+            snake.foods_eaten = 0
+    return False
+
+def _torus_neighbors(width, height):
+    """Function giving a cell id's neighbours in DIRECTIONS order, wrapping like Snake.update"""
+    last_row = (height - 1) * width  # id of the first cell of the bottom row
+    right = width - 1
+
+    def neighbors(cell):
+        x = cell % width
+        return (cell - width if cell >= width else cell + last_row,
+                cell + width if cell < last_row else cell - last_row,
+                cell - 1 if x else cell + right,
+                cell + 1 if x < right else cell - x)
+    return neighbors
+
+class Autopilot:
+    """Chooses snake.direction from a distance field to the food, checked for tail safety.
+
+    The field maps cells to their steps from the food and to the next cell
+    on the way there. It is searched backward from the food toward the head
+    (like D* Lite), so it stays valid while the head moves, and it is kept
+    between ticks until the food moves or the snake is replaced:
+    - Growing: each tick expands at most FIELD_BUDGET cells, nearest the head
+      first, until the field reaches the head. Meanwhile the safe move nearest
+      the food is taken.
+    - Following: a head in the field steps to the cell it points at. Only the
+      head enters new cells, and those lie behind it, so the way ahead stays
+      free; the whole way is checked only when the head joins the field.
+    - Repair: a cell freed by the tail is labelled from the field next to it;
+      a way found blocked restarts the field.
+    A move is safe if a flood fill from it reaches the tail, twice the snake's
+    length or SAFE_BUDGET free cells, so no decision scans the whole board.
+
+    Neighbours are computed from cell ids and the field is kept in dicts that
+    hold only the cells searched, so memory and set-up time do not grow with
+    the board.
+    """
+    # Cells the field may expand per tick
+    FIELD_BUDGET = 128
+    # Free cells a safety check counts before it accepts a move
+    SAFE_BUDGET = 200
+
+    def __init__(self, width=None, height=None):
+        self.width = width = width or GRID_WIDTH
+        self.height = height = height or GRID_HEIGHT
+        self._neighbors = _torus_neighbors(width, height)
+        self.snake = None
+        self.food = None
+        self.steps = {}  # cell -> steps to the food
+        self.next = {}  # cell -> next cell toward the food
+        self.heap = []  # (priority, -steps, cell) still to expand
+        self.joined = None  # head cell whose way to the food was last checked
+        self.searches = 0
+
+    def _cell(self, position):
+        return position[1] * self.width + position[0]
+
+    def _distance(self, cell, goal):
+        """Steps between two cells on the torus, ignoring the body"""
+        width, height = self.width, self.height
+        dx = abs(cell % width - goal % width)
+        dy = abs(cell // width - goal // width)
+        return min(dx, width - dx) + min(dy, height - dy)
+
+    def _restart(self, snake, food_cell):
+        self.searches += 1
+        self.snake = snake
+        self.food = food_cell
+        self.steps = {food_cell: 0}
+        self.next = {food_cell: None}
+        self.heap = [(0, 0, food_cell)]
+        self.joined = None
+
+    def _grow(self, head, occupied):
+        """Expand the field toward head by up to FIELD_BUDGET cells; True once it holds head"""
+        width, height = self.width, self.height
+        head_x, head_y = head % width, head // width
+        neighbors = self._neighbors
+        steps_to = self.steps
+        next_cell = self.next
+        heap = self.heap
+        expanded = 0
+        while heap and expanded < self.FIELD_BUDGET:
+            _, steps, u = heappop(heap)
+            if occupied[u] and u != self.food:
+                continue  # the head moved in after u was labelled
+            expanded += 1
+            steps = 1 - steps
+            for v in neighbors(u):
+                if v in steps_to:
+                    continue
+                if v == head:
+                    steps_to[v] = steps
+                    next_cell[v] = u
+                    heappush(heap, (steps, -steps, u))  # u may have more to label
+                    return True
+                if occupied[v]:
+                    continue
+                steps_to[v] = steps
+                next_cell[v] = u
+                # Ties go to the cell furthest from the food, so open ground
+                # costs about one expansion per step; _distance(v, head), inlined
+                dx = abs(v % width - head_x)
+                dy = abs(v // width - head_y)
+                if 2 * dx > width:
+                    dx = width - dx
+                if 2 * dy > height:
+                    dy = height - dy
+                heappush(heap, (steps + dx + dy, -steps, v))
+        return head in steps_to
+
+    def _repair_tail(self, snake):
+        """Let the field expand into the cell the tail just left"""
+        if snake.last_tail is None:
+            return
+        cell = self._cell(snake.last_tail)
+        if cell in self.steps or snake.occupied[cell]:
+            return
+        for v in self._neighbors(cell):
+            steps = self.steps.get(v)
+            if steps is not None:
+                heappush(self.heap, (steps, -steps, v))
+
+    def _clear_way(self, head, tail, occupied):
+        """Whether every cell from head's next cell to the food is free (the tail counts as free)"""
+        next_cell = self.next
+        u = next_cell[head]
+        while u is not None:
+            if occupied[u] and u != tail:
+                return False
+            u = next_cell[u]
+        return True
+
+    def _safe(self, cell, snake):
+        """Whether moving into cell leaves the tail, or enough free cells, reachable"""
+        neighbors = self._neighbors
+        occupied = snake.occupied
+        tail = self._cell(snake.positions[-1])
+        if cell == tail:
+            return True
+        goal = min(2 * snake.length, self.SAFE_BUDGET)
+        seen = {cell}
+        frontier = [cell]
+        while frontier:
+            next_frontier = []
+            for u in frontier:
+                for v in neighbors(u):
+                    if v == tail:
+                        return True
+                    if v not in seen and not occupied[v]:
+                        seen.add(v)
+                        if len(seen) >= goal:
+                            return True
+                        next_frontier.append(v)
+            frontier = next_frontier
+        return False
+
+    def choose(self, snake, food):
+        """Return the direction to move in this tick"""
+        if food.position is None:
+            return snake.direction
+        occupied = snake.occupied
+        head = self._cell(snake.positions[0])
+        tail = self._cell(snake.positions[-1])
+        food_cell = self._cell(food.position)
+        if snake is not self.snake or food_cell != self.food:
+            self._restart(snake, food_cell)
+        else:
+            self._repair_tail(snake)
+        way = None
+        if head in self.steps or self._grow(head, occupied):
+            if self.joined != head and not self._clear_way(head, tail, occupied):
+                # Drawn through cells the body has entered since: search afresh
+                self._restart(snake, food_cell)
+                if self._grow(head, occupied):
+                    way = self.next[head]
+            else:
+                way = self.next[head]
+        options = []
+        for i, cell in enumerate(self._neighbors(head)):
+            # Same rule as Snake.update: the tail cell may be entered
+            count = occupied[cell]
+            if count and (count > 1 or cell != tail):
+                continue
+            if cell == way:
+                if self._safe(cell, snake):
+                    self.joined = cell
+                    return DIRECTIONS[i]
+                way = None
+            options.append((self._distance(cell, food_cell), DIRECTIONS[i] != snake.direction, i, cell))
+        options.sort()
+        for _, _, i, cell in options:
+            if self._safe(cell, snake):
+                return DIRECTIONS[i]
+        return DIRECTIONS[options[0][2]] if options else snake.direction
+
+def main(seed=None, recorder=None, profile_path=None, autopilot=False,
+         width=GRID_WIDTH, height=GRID_HEIGHT):
+    """Main game function (autopilot: start with the autopilot steering, toggled with A).
+
+    Boards larger than the window are shown through a camera following the head.
+    """
     clock = pygame.time.Clock()
     screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
     pygame.display.set_caption("Enhanced Snake Game")
     
-    snake = Snake()
-    food = Food(snake.positions)
+    snake = Snake(width, height)
+    food = Food(snake.positions, random.Random(seed), snake.free_cells, width, height)
+    if width <= GRID_WIDTH and height <= GRID_HEIGHT:
+        renderer = SnakeRenderer(screen)
+    else:
+        renderer = CameraRenderer(screen)
+    overlay_rect = None
+    pilot = Autopilot(width, height) if autopilot else None
+    if recorder:
+        recorder.size = (width, height)
     
     game_over = False
     base_speed = FPS
     current_speed = base_speed
+    profile = profiler.FrameProfiler(('events', 'update', 'draw'), base_speed)
     
     while True:
+        profile.begin_frame()
+        restarted = False
         for event in pygame.event.get():
             if event.type == QUIT:
+                if recorder:
+                    recorder.close(replay.snake_digest(snake, food, game_over))
+                if profile_path:
+                    profile.export(profile_path)
                 pygame.quit()
                 sys.exit()
             elif event.type == KEYDOWN:
-                if game_over:
+                if event.key == K_F3:
+                    profile.toggle_overlay()
+                elif event.key == K_a:
+                    pilot = None if pilot else Autopilot(width, height)
+                elif game_over:
                     if event.key == K_r:
                         # Reset game
                         snake.reset()
-                        food.randomize_position(snake.positions)
+                        food.randomize_position(snake.positions, snake.free_cells)
                         game_over = False
+                        restarted = True
                         current_speed = base_speed
+                        renderer.invalidate()
                 else:
                     # Handle direction changes (no 180-degree turns allowed)
                     if event.key == K_UP and snake.direction != DOWN:
@@ -166,37 +657,58 @@ def main():
                     elif event.key == K_RIGHT and snake.direction != LEFT:
                         snake.direction = RIGHT
         
+        if pilot and not game_over:
+            snake.direction = pilot.choose(snake, food)
+        if recorder:
+            recorder.tick(replay.encode_snake_tick(snake.direction, restarted))
+        profile.mark('events')
+        
         if not game_over:
-            # Update snake position
-            game_over = snake.update()
-            
-            # Check if snake ate food
-            if snake.get_head_position() == food.position:
-                snake.length += 1
-                snake.score += 10
-                snake.foods_eaten += 1
-                food.randomize_position(snake.positions)
-                
-                # Check for level up
-                if snake.foods_eaten >= snake.foods_to_next_level:
-                    snake.level += 1
-                    snake.foods_eaten = 0
-                    current_speed = base_speed + snake.level  # Increase speed with level
+            level = snake.level
+            game_over = step(snake, food)
+            if snake.level != level:
+                current_speed = base_speed + snake.level  # Increase speed with level
+            profile.mark('update')
             
-            # Clear screen
-            screen.fill(BLACK)
-            draw_grid(screen)
-            
-            # Draw game elements
-            snake.render(screen)
-            food.render(screen)
-            show_score(screen, snake.score, snake.level)
+            # Repaint only the cells that changed since the last frame
+            if overlay_rect:
+                renderer.restore(overlay_rect, snake, food)
+            dirty = renderer.draw(snake, food)
+            if overlay_rect:
+                dirty.append(overlay_rect)
+            overlay_rect = profile.draw_overlay(screen)
+            if overlay_rect:
+                dirty.append(overlay_rect)
+            pygame.display.update(dirty)
         else:
             # Show game over screen
-            show_game_over(screen, snake.score, snake.level)
-        
-        pygame.display.update()
+            show_game_over(screen, snake.score, snake.level, food.position is None)
+            profile.draw_overlay(screen)
+            pygame.display.update()
+            overlay_rect = None
+            renderer.invalidate()
+        profile.mark('draw')
+        profile.set_target_fps(current_speed)
+        profile.end_frame()
         clock.tick(current_speed)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    import argparse
+    parser = argparse.ArgumentParser(description="Snake game")
+    parser.add_argument('--seed', type=int, help="seed for food placement")
+    parser.add_argument('--record', metavar='PATH', help="record the session for replay.py")
+    parser.add_argument('--profile', metavar='PATH',
+                        help="write frame timings on exit (.json summary or .csv per frame)")
+    parser.add_argument('--autopilot', action='store_true', help="let the autopilot steer (toggle with A)")
+    parser.add_argument('--board', metavar='WxH', default=f"{GRID_WIDTH}x{GRID_HEIGHT}",
+                        help="board size in cells; larger than %(default)s scrolls with the head")
+    args = parser.parse_args()
+    width, height = (int(part) for part in args.board.lower().split('x'))
+    
+    recorder = None
+    if args.record:
+        seed = args.seed if args.seed is not None else random.randrange(2 ** 63)
+        recorder = replay.Recorder(args.record, replay.SNAKE, seed)
+        main(seed, recorder, args.profile, args.autopilot, width, height)
+    else:
+        main(args.seed, profile_path=args.profile, autopilot=args.autopilot, width=width, height=height)
\ No newline at end of file
@@ -0,0 +1,283 @@
+import numpy as np
+
+from snake import GRID_WIDTH, GRID_HEIGHT, DIRECTIONS
+
+CELLS = GRID_WIDTH * GRID_HEIGHT
+# Cell ids fit in int16 on the default board
+CELL_DTYPE = np.int16 if CELLS < 2 ** 15 else np.int32
+# Direction index of snake.RIGHT, the starting direction
+START_DIRECTION = DIRECTIONS.index((1, 0))
+START_CELL = (GRID_HEIGHT // 2) * GRID_WIDTH + GRID_WIDTH // 2
+
+DIRECTION_DX = np.array([dx for dx, dy in DIRECTIONS], np.int32)
+DIRECTION_DY = np.array([dy for dx, dy in DIRECTIONS], np.int32)
+
+
+class SnakeBatch:
+    """N independent snake games stepped together with NumPy.
+
+    Each game follows snake.step: wrap-around moves, the tail-chasing
+    self-collision rule of Snake.update, eating, level-ups every
+    foods_to_next_level foods and food respawn. Bodies are ring buffers of cell
+    ids (row-major, like Snake.occupied) with a per-cell segment count, and the
+    free cells are kept in the same swap-remove layout as snake.FreeCells, so a
+    food draw of index i picks the same cell the reference would. Randomness
+    comes from a single numpy Generator; cross_validate() feeds its draws to
+    the reference classes to check the two engines agree.
+
+    Memory is about 7 bytes per cell per game on the default board (two int16
+    free-cell arrays, an int16 body ring and a uint8 count grid), ~6 KB a game.
+    """
+
+    foods_to_next_level = 3
+
+    def __init__(self, n, seed=None):
+        self.n = n
+        self.rng = np.random.default_rng(seed)
+
+        self.body = np.zeros((n, CELLS + 1), CELL_DTYPE)  # ring buffer, head at body[head]
+        self.head = np.zeros(n, np.int32)
+        self.size = np.zeros(n, np.int32)  # segments in the ring (len(Snake.positions))
+        self.occupied = np.zeros((n, CELLS), np.uint8)
+        self.free_cells = np.zeros((n, CELLS), CELL_DTYPE)
+        self.free_slots = np.zeros((n, CELLS), CELL_DTYPE)
+        self.free_count = np.zeros(n, np.int32)
+
+        self.direction = np.zeros(n, np.int8)  # index into snake.DIRECTIONS
+        self.food = np.zeros(n, np.int32)  # cell id, -1 once the board is full
+        self.length = np.zeros(n, np.int32)
+        self.score = np.zeros(n, np.int64)
+        self.level = np.zeros(n, np.int32)
+        self.foods_eaten = np.zeros(n, np.int32)
+        self.ticks = np.zeros(n, np.int64)
+        self.game_over = np.zeros(n, bool)
+
+        # Empty boards, laid out like a new snake.FreeCells
+        self.free_cells[:] = np.arange(CELLS, dtype=CELL_DTYPE)
+        self.free_slots[:] = np.arange(CELLS, dtype=CELL_DTYPE)
+        self.free_count[:] = CELLS
+        self.reset()
+
+    def reset(self, mask=None):
+        """Reset the selected games (all if mask is None) like Snake.reset and a food draw.
+
+        The body is handed back to the free cells head first, as Snake.set_body
+        does, so the free-cell layout and thus the next food match the
+        reference engine after a restart too.
+        """
+        rows = np.arange(self.n) if mask is None else np.flatnonzero(mask)
+        if rows.size == 0:
+            return
+        playing = rows
+        for segment in range(int(self.size[rows].max())):
+            playing = playing[self.size[playing] > segment]
+            cells = self.body[playing, (self.head[playing] - segment) % (CELLS + 1)]
+            held = self.occupied[playing, cells] > 0
+            self._give(playing[held], cells[held])
+            self.occupied[playing, cells] = 0
+        start = np.full(rows.size, START_CELL, np.int32)
+        self._take(rows, start)
+        self.occupied[rows, START_CELL] = 1
+        self.head[rows] = 0
+        self.body[rows, 0] = START_CELL
+        self.size[rows] = 1
+
+        self.direction[rows] = START_DIRECTION
+        self.length[rows] = 1
+        self.score[rows] = 0
+        self.level[rows] = 1
+        self.foods_eaten[rows] = 0
+        self.ticks[rows] = 0
+        self.game_over[rows] = False
+        self._place_food(rows)
+
+    def _take(self, rows, cells):
+        """FreeCells.remove for one cell per row"""
+        slots = self.free_slots[rows, cells]
+        self.free_count[rows] -= 1
+        last = self.free_cells[rows, self.free_count[rows]]
+        self.free_cells[rows, slots] = last
+        self.free_slots[rows, last] = slots
+        self.free_slots[rows, cells] = -1
+
+    def _give(self, rows, cells):
+        """FreeCells.add for one cell per row"""
+        count = self.free_count[rows]
+        self.free_cells[rows, count] = cells
+        self.free_slots[rows, cells] = count
+        self.free_count[rows] = count + 1
+
+    def _place_food(self, rows):
+        """Food.randomize_position for the given rows; return the rows whose board is full"""
+        full = self.free_count[rows] == 0
+        self.food[rows[full]] = -1
+        rows = rows[~full]
+        if rows.size:
+            index = self.rng.integers(self.free_count[rows])
+            self.food[rows] = self.free_cells[rows, index]
+        return full
+
+    def step(self, directions=None):
+        """Advance every running game by one tick.
+
+        directions is a per-game (or scalar) index into snake.DIRECTIONS; None
+        keeps each game's current direction. Returns the game_over array.
+        """
+        if directions is not None:
+            self.direction[:] = directions
+        rows = np.flatnonzero(~self.game_over)
+        if rows.size == 0:
+            return self.game_over
+        self.ticks[rows] += 1
+
+        head = self.body[rows, self.head[rows]].astype(np.int32)
+        direction = self.direction[rows]
+        x = (head % GRID_WIDTH + DIRECTION_DX[direction]) % GRID_WIDTH
+        y = (head // GRID_WIDTH + DIRECTION_DY[direction]) % GRID_HEIGHT
+        cell = y * GRID_WIDTH + x
+
+        # Self collision; the tail cell is free unless another segment shares it
+        count = self.occupied[rows, cell]
+        tail_index = (self.head[rows] - self.size[rows] + 1) % (CELLS + 1)
+        tail = self.body[rows, tail_index]
+        crashed = (count > 0) & ((count > 1) | (tail != cell))
+        self.game_over[rows[crashed]] = True
+        moving = ~crashed
+        rows, cell, count, tail_index = rows[moving], cell[moving], count[moving], tail_index[moving]
+
+        # Push the new head
+        fresh = count == 0
+        self._take(rows[fresh], cell[fresh])
+        self.occupied[rows, cell] = count + 1
+        self.head[rows] = (self.head[rows] + 1) % (CELLS + 1)
+        self.body[rows, self.head[rows]] = cell
+        self.size[rows] += 1
+
+        # Drop the tail unless the snake is growing
+        shrink = self.size[rows] > self.length[rows]
+        shrinking = rows[shrink]
+        tail = self.body[shrinking, tail_index[shrink]]
+        self.size[shrinking] -= 1
+        self.occupied[shrinking, tail] -= 1
+        freed = self.occupied[shrinking, tail] == 0
+        self._give(shrinking[freed], tail[freed])
+
+        # Eat, respawn food, level up
+        eaten = rows[cell == self.food[rows]]
+        self.length[eaten] += 1
+        self.score[eaten] += 10
+        self.foods_eaten[eaten] += 1
+        won = self._place_food(eaten)
+        self.game_over[eaten[won]] = True
+        eaten = eaten[~won]
+        leveled = eaten[self.foods_eaten[eaten] >= self.foods_to_next_level]
+        self.level[leveled] += 1
+        self.foods_eaten[leveled] = 0
+        return self.game_over
+
+    def run(self, ticks, directions=None, reset_finished=False):
+        """Step all games for a number of ticks; returns completed-episode scores"""
+        finished = []
+        for _ in range(ticks):
+            done = self.step(directions)
+            if reset_finished and done.any():
+                finished.append(self.score[done].copy())
+                self.reset(done.copy())
+        return np.concatenate(finished) if finished else np.empty(0, np.int64)
+
+    def positions(self, game):
+        """Body of one game as (x, y) tuples from head to tail, like Snake.positions"""
+        index = (self.head[game] - np.arange(self.size[game])) % (CELLS + 1)
+        return [(int(cell) % GRID_WIDTH, int(cell) // GRID_WIDTH) for cell in self.body[game, index]]
+
+    def food_position(self, game):
+        """Food cell of one game as an (x, y) tuple, or None like Food.position"""
+        cell = int(self.food[game])
+        return None if cell < 0 else (cell % GRID_WIDTH, cell // GRID_WIDTH)
+
+
+def cross_validate(games=64, ticks=3000, seed=0):
+    """Play the same inputs through SnakeBatch and snake.Snake/Food and compare every tick.
+
+    The batch's food draws are fed to the reference Food objects, so both engines
+    see identical randomness. Finished games restart as in run(reset_finished=True)
+    and Snake.reset, and their free-cell layouts are compared too. Raises
+    AssertionError on the first divergence; returns the ticks played, the best
+    score and the number of restarts.
+    """
+    import random
+    from collections import deque
+    import episodes
+    import snake
+
+    draws = deque()
+    batch = SnakeBatch(games, seed)
+    generator = batch.rng
+
+    class Recorder:
+        def integers(self, high):
+            values = generator.integers(high)
+            draws.extend(zip(high.tolist(), values.tolist()))
+            return values
+
+    class Feed:
+        """Stands in for random.Random in the reference Food"""
+        def randrange(self, count):
+            high, value = draws.popleft()
+            assert high == count, (high, count)
+            return value
+
+    batch.rng = Recorder()
+    batch.reset()
+    snakes = [snake.Snake() for _ in range(games)]
+    foods = [snake.Food(s.positions, Feed(), s.free_cells) for s in snakes]
+    policy_rng = random.Random(seed)
+    best = 0
+    restarts = 0
+
+    for tick in range(ticks):
+        directions = []
+        for s, food in zip(snakes, foods):
+            if policy_rng.random() < 0.9:
+                directions.append(episodes.snake_greedy(s, food, policy_rng))
+            else:
+                directions.append(episodes.snake_random(s, food, policy_rng))
+        batch.step([DIRECTIONS.index(d) for d in directions])
+        over = []
+        for s, food, direction in zip(snakes, foods, directions):
+            s.direction = direction
+            over.append(snake.step(s, food))
+        done = batch.game_over.copy()
+        assert over == done.tolist(), f"game over diverged at tick {tick}"
+        best = max(best, int(batch.score.max()))
+        # Restart in game order, after every step, as the batch draws its foods
+        batch.reset(done)
+        for game in np.flatnonzero(done):
+            s, food = snakes[game], foods[game]
+            s.reset()
+            food.randomize_position(s.positions, s.free_cells)
+            count = s.free_cells.count
+            assert list(s.free_cells.cells[:count]) == batch.free_cells[game, :count].tolist(), \
+                f"game {game} free cells diverged after the restart at tick {tick}"
+            restarts += 1
+        for game, (s, food) in enumerate(zip(snakes, foods)):
+            state = (list(s.positions), food.position, s.length, s.score, s.level, s.foods_eaten)
+            batched = (batch.positions(game), batch.food_position(game), batch.length[game],
+                       batch.score[game], batch.level[game], batch.foods_eaten[game])
+            assert state == batched, f"game {game} diverged at tick {tick}: {state} != {batched}"
+        assert not draws
+    return tick + 1, best, restarts
+
+
+if __name__ == "__main__":
+    import time
+    ticks, best, restarts = cross_validate()
+    print(f"cross-validation OK: {ticks} ticks, {restarts} restarts, best score {best}")
+    batch = SnakeBatch(10000, 1)
+    rng = np.random.default_rng(2)
+    start = time.perf_counter()
+    for _ in range(200):
+        batch.step(rng.integers(len(DIRECTIONS), size=batch.n))
+        batch.reset(batch.game_over)
+    elapsed = time.perf_counter() - start
+    print(f"{batch.n * 200 / elapsed:.0f} game ticks/s ({elapsed / 200 * 1000:.2f} ms per step of {batch.n} games)")
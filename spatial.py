@@ -0,0 +1,159 @@
+import pygame
+
+# Default grid cell size; larger than any racer sprite so each spans at most 2x2 cells
+CELL_SIZE = 128
+
+
+class SpatialGroup(pygame.sprite.Group):
+    """Sprite group backed by a uniform-grid spatial hash.
+
+    Sprites are bucketed by the grid cells their rect overlaps. Call
+    reindex(sprite) (or moved(sprite)) after changing a sprite's rect; the
+    buckets are only touched when the sprite crosses a cell boundary.
+    """
+
+    def __init__(self, *sprites, cell_size=CELL_SIZE):
+        self.cell_size = cell_size
+        self.cells = {}         # (cx, cy) -> {sprite: None}
+        self.sprite_bounds = {}  # sprite -> (cx0, cy0, cx1, cy1)
+        self.order = {}         # sprite -> insertion sequence, keeps results in group order
+        self.next_order = 0
+        super().__init__(*sprites)
+
+    def _bounds(self, rect):
+        """Inclusive cell range covered by a rect"""
+        size = self.cell_size
+        return (rect.left // size, rect.top // size,
+                (rect.right - 1) // size if rect.width else rect.left // size,
+                (rect.bottom - 1) // size if rect.height else rect.top // size)
+
+    def _link(self, sprite, bounds):
+        cells = self.cells
+        cx0, cy0, cx1, cy1 = bounds
+        for cx in range(cx0, cx1 + 1):
+            for cy in range(cy0, cy1 + 1):
+                bucket = cells.get((cx, cy))
+                if bucket is None:
+                    bucket = cells[(cx, cy)] = {}
+                bucket[sprite] = None
+        self.sprite_bounds[sprite] = bounds
+
+    def _unlink(self, sprite):
+        cells = self.cells
+        cx0, cy0, cx1, cy1 = self.sprite_bounds.pop(sprite)
+        for cx in range(cx0, cx1 + 1):
+            for cy in range(cy0, cy1 + 1):
+                bucket = cells[(cx, cy)]
+                del bucket[sprite]
+                if not bucket:
+                    del cells[(cx, cy)]
+
+    def add_internal(self, sprite, layer=None):
+        super().add_internal(sprite, layer)
+        self.order[sprite] = self.next_order
+        self.next_order += 1
+        self._link(sprite, self._bounds(sprite.rect))
+
+    def remove_internal(self, sprite):
+        super().remove_internal(sprite)
+        del self.order[sprite]
+        self._unlink(sprite)
+
+    def reindex(self, sprite):
+        """Move a sprite to the buckets matching its current rect"""
+        bounds = self._bounds(sprite.rect)
+        if bounds != self.sprite_bounds[sprite]:
+            self._unlink(sprite)
+            self._link(sprite, bounds)
+
+    def query(self, rect):
+        """Return sprites whose cells overlap rect (broadphase candidates)"""
+        cells = self.cells
+        cx0, cy0, cx1, cy1 = self._bounds(rect)
+        if cx0 == cx1 and cy0 == cy1:
+            return list(cells.get((cx0, cy0), ()))
+        found = {}
+        for cx in range(cx0, cx1 + 1):
+            for cy in range(cy0, cy1 + 1):
+                bucket = cells.get((cx, cy))
+                if bucket:
+                    found.update(bucket)
+        return list(found)
+
+    def spritecollide(self, sprite, dokill, collided=None):
+        """Same contract as pygame.sprite.spritecollide, using the grid"""
+        candidates = self.query(sprite.rect)
+        if collided is None:
+            rect = sprite.rect
+            hits = [other for other in candidates if rect.colliderect(other.rect)]
+        else:
+            hits = [other for other in candidates if collided(sprite, other)]
+        if len(hits) > 1:
+            hits.sort(key=self.order.__getitem__)
+        if dokill:
+            for other in hits:
+                other.kill()
+        return hits
+
+
+def moved(sprite):
+    """Tell every spatial group containing sprite that its rect changed"""
+    for group in sprite.groups():
+        if isinstance(group, SpatialGroup):
+            group.reindex(sprite)
+
+
+def spritecollide(sprite, group, dokill, collided=None):
+    """Drop-in replacement for pygame.sprite.spritecollide"""
+    if isinstance(group, SpatialGroup):
+        return group.spritecollide(sprite, dokill, collided)
+    return pygame.sprite.spritecollide(sprite, group, dokill, collided)
+
+
+def _benchmark(counts=(10, 100, 1000, 5000), queries=50, frames=20):
+    """Compare linear and grid collision queries as entity count grows"""
+    import random
+    import time
+
+    rng = random.Random(0)
+    world = 4000
+    print(f"{'sprites':>8} {'linear ms':>10} {'grid ms':>10} {'reindex ms':>11} {'speedup':>8}")
+    for count in counts:
+        linear = pygame.sprite.Group()
+        grid = SpatialGroup()
+        for _ in range(count):
+            sprite = pygame.sprite.Sprite()
+            sprite.rect = pygame.Rect(rng.randrange(world), rng.randrange(world), 50, 100)
+            linear.add(sprite)
+            grid.add(sprite)
+        probes = []
+        for _ in range(queries):
+            probe = pygame.sprite.Sprite()
+            probe.rect = pygame.Rect(rng.randrange(world), rng.randrange(world), 50, 100)
+            probes.append(probe)
+
+        start = time.perf_counter()
+        for _ in range(frames):
+            for probe in probes:
+                pygame.sprite.spritecollide(probe, linear, False)
+        linear_time = (time.perf_counter() - start) / frames
+
+        start = time.perf_counter()
+        for _ in range(frames):
+            for probe in probes:
+                grid.spritecollide(probe, False)
+        grid_time = (time.perf_counter() - start) / frames
+
+        start = time.perf_counter()
+        for _ in range(frames):
+            for sprite in grid:
+                sprite.rect.y += 5
+                grid.reindex(sprite)
+        reindex_time = (time.perf_counter() - start) / frames
+
+        print(f"{count:>8} {linear_time * 1000:>10.3f} {grid_time * 1000:>10.3f} "
+              f"{reindex_time * 1000:>11.3f} {linear_time / grid_time:>7.1f}x")
+
+
+if __name__ == "__main__":
+    _benchmark()
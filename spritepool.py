@@ -0,0 +1,81 @@
+import abc
+
+import pygame
+
+# Images shared by every sprite of a kind, built on first use
+_shared_images = {}
+
+
+def shared_image(key, build):
+    """Return the shared image for key, calling build() the first time"""
+    image = _shared_images.get(key)
+    if image is None:
+        image = _shared_images[key] = build()
+    return image
+
+
+class PooledSprite(pygame.sprite.Sprite, metaclass=abc.ABCMeta):
+    """Sprite that can be reset in place and handed back to its pool.
+
+    Subclasses implement reset(*args) to re-randomize their state; __init__
+    should just call it so a fresh and a recycled sprite are identical.
+    pygame.sprite.Sprite instances always carry a __dict__, so __slots__ would
+    not shrink them; the per-sprite saving comes from shared images instead.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.pool = None
+
+    @abc.abstractmethod
+    def reset(self, *args):
+        """Re-randomize the sprite's state for another spawn"""
+
+    def recycle(self):
+        """Remove from all groups and return to the owning pool"""
+        self.kill()
+        if self.pool is not None:
+            self.pool.release(self)
+
+
+class SpritePool:
+    """Free list of sprites of one class, reused instead of reallocated"""
+
+    def __init__(self, sprite_class, max_free=64):
+        self.sprite_class = sprite_class
+        self.max_free = max_free
+        self.free = []
+        self.allocated = 0
+        self.reused = 0
+        self.discarded = 0
+
+    def acquire(self, *args):
+        """Return a reset sprite, recycling a released one when available"""
+        if self.free:
+            sprite = self.free.pop()
+            sprite.reset(*args)
+            self.reused += 1
+        else:
+            sprite = self.sprite_class(*args)
+            self.allocated += 1
+        sprite.pool = self
+        return sprite
+
+    def release(self, sprite):
+        """Take back a sprite that has left play"""
+        sprite.pool = None
+        if len(self.free) < self.max_free:
+            self.free.append(sprite)
+        else:
+            self.discarded += 1
+
+    def stats(self, play_ticks=0, fps=60):
+        """Return pool counters; avoided_per_minute needs the ticks played"""
+        minutes = play_ticks / fps / 60
+        return {
+            'allocated': self.allocated,
+            'reused': self.reused,
+            'discarded': self.discarded,
+            'free': len(self.free),
+            'avoided_per_minute': self.reused / minutes if minutes else 0.0,
+        }
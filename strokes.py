@@ -0,0 +1,91 @@
+import math
+from array import array
+
+import pygame
+
+
+def draw_polyline(surface, color, points, width, dx=0, dy=0, scale=1):
+    """Draw connected segments with round joins and caps; return the changed rect.
+
+    Every segment is a quad width pixels wide and every point a disc of the
+    same diameter, so joins have no notches at any angle. points are (x, y)
+    pairs, drawn at (x * scale + dx, y * scale + dy).
+    """
+    points = [(x * scale + dx, y * scale + dy) for x, y in points]
+    radius = width * scale / 2
+    if radius < 1:
+        if len(points) == 1:
+            return pygame.draw.circle(surface, color, points[0], 1)
+        return pygame.draw.lines(surface, color, False, points)
+    changed = pygame.draw.circle(surface, color, points[0], radius)
+    for (x1, y1), (x2, y2) in zip(points, points[1:]):
+        length = math.hypot(x2 - x1, y2 - y1)
+        if length:
+            nx = (y1 - y2) / length * radius
+            ny = (x2 - x1) / length * radius
+            changed.union_ip(pygame.draw.polygon(surface, color, (
+                (x1 + nx, y1 + ny), (x2 + nx, y2 + ny), (x2 - nx, y2 - ny), (x1 - nx, y1 - ny))))
+        changed.union_ip(pygame.draw.circle(surface, color, (x2, y2), radius))
+    return changed
+
+
+class Stroke:
+    """One freehand stroke as vector data: a colour, a width and its points.
+
+    Points are kept as a flat array of int32 x, y pairs (8 bytes a point), so
+    strokes can be stored, re-rasterized at any scale or replayed for export
+    (see rasterize).
+    """
+    __slots__ = ('color', 'width', 'points')
+
+    def __init__(self, color, width, points=()):
+        self.color = color
+        self.width = width
+        self.points = array('i')
+        for point in points:
+            self.add(point)
+
+    def __len__(self):
+        return len(self.points) // 2
+
+    def add(self, point):
+        """Append a point unless it repeats the last one"""
+        points = self.points
+        if not points or points[-2] != point[0] or points[-1] != point[1]:
+            points.extend(point)
+
+    def segment(self, start=0):
+        """Points from index start on, as (x, y) tuples"""
+        coordinates = self.points[2 * start:]
+        return list(zip(coordinates[::2], coordinates[1::2]))
+
+    def bounds(self, start=0):
+        """Rect covering everything drawn for the points from index start on"""
+        coordinates = self.points[2 * start:]
+        xs, ys = coordinates[::2], coordinates[1::2]
+        reach = self.width // 2 + 2
+        return pygame.Rect(min(xs) - reach, min(ys) - reach,
+                           max(xs) - min(xs) + 2 * reach + 1, max(ys) - min(ys) + 2 * reach + 1)
+
+    def render(self, canvas, start=0):
+        """Rasterize the points from index start on into a tiledcanvas.TiledCanvas in one pass.
+
+        Starting at the last point already drawn extends a stroke as it grows.
+        """
+        segment = self.segment(start)
+        return canvas.draw(self.bounds(start), self.color, lambda surface, dx, dy: draw_polyline(
+            surface, self.color, segment, self.width, dx, dy))
+
+
+def rasterize(strokes, size, scale=1, background=(255, 255, 255), report=None):
+    """Replay strokes onto a new surface of size scaled by scale, e.g. for export.
+
+    report(fraction), if given, is called before each stroke.
+    """
+    surface = pygame.Surface((math.ceil(size[0] * scale), math.ceil(size[1] * scale)))
+    surface.fill(background)
+    for done, stroke in enumerate(strokes):
+        if report:
+            report(done / len(strokes))
+        draw_polyline(surface, stroke.color, stroke.segment(), stroke.width, scale=scale)
+    return surface
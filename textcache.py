@@ -0,0 +1,81 @@
+from collections import OrderedDict
+
+import pygame
+
+# Default number of rendered text surfaces kept alive
+CACHE_SIZE = 256
+
+
+class TextCache:
+    """Font registry plus a bounded LRU cache of rendered text surfaces.
+
+    Cached surfaces are shared between callers, so treat them as read-only.
+    """
+
+    def __init__(self, max_entries=CACHE_SIZE):
+        self.max_entries = max_entries
+        self.fonts = {}
+        self.surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def font(self, name, size, bold=False, italic=False):
+        """Return a SysFont, constructing it only the first time it is asked for"""
+        key = (name, size, bold, italic)
+        font = self.fonts.get(key)
+        if font is None:
+            font = self.fonts[key] = pygame.font.SysFont(name, size, bold, italic)
+        return font
+
+    def render(self, font, text, antialias, color):
+        """Cached equivalent of font.render(text, antialias, color)"""
+        key = (font, text, tuple(color), antialias)
+        surfaces = self.surfaces
+        surface = surfaces.get(key)
+        if surface is not None:
+            self.hits += 1
+            surfaces.move_to_end(key)
+            return surface
+        self.misses += 1
+        surface = surfaces[key] = font.render(text, antialias, color)
+        if len(surfaces) > self.max_entries:
+            surfaces.popitem(last=False)
+            self.evictions += 1
+        return surface
+
+    def clear(self):
+        """Drop all rendered surfaces and reset the counters"""
+        self.surfaces.clear()
+        self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        """Return hit/miss counters for the cache"""
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'entries': len(self.surfaces),
+            'fonts': len(self.fonts),
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+
+# Shared cache used by racer, snake and paint
+default_cache = TextCache()
+
+
+def get_font(name, size, bold=False, italic=False):
+    """Return a font from the shared registry"""
+    return default_cache.font(name, size, bold, italic)
+
+
+def render_text(font, text, antialias, color):
+    """Render text through the shared cache"""
+    return default_cache.render(font, text, antialias, color)
+
+
+def stats():
+    """Return statistics for the shared cache"""
+    return default_cache.stats()
@@ -0,0 +1,497 @@
+import math
+import mmap
+import tempfile
+import zlib
+from collections import OrderedDict
+
+import pygame
+
+# Side of the square tiles the document is split into
+TILE = 256
+# Tiles kept in memory before the least recently used are paged out
+RESIDENT_TILES = 256
+# Largest shape bounds (pixels) rasterized in one pass, see TiledCanvas.draw
+SCRATCH_LIMIT = 4096 * 4096
+# Changed rects kept for take_damage() before they are merged into one
+MAX_DAMAGE = 32
+# Memory for shrunk copies of tiles shown zoomed out, see TiledCanvas.render
+MIP_BYTES = 16 * 2 ** 20
+# Zoom steps of the viewport
+ZOOM_LEVELS = (0.125, 0.25, 0.5, 1, 2, 4, 8)
+OUTSIDE = (120, 120, 120)
+
+
+class TiledCanvas:
+    """A sparse document of width x height pixels stored as TILE x TILE tiles.
+
+    Tiles are allocated on the first write that actually changes them; the
+    rest of the document reads as the background color. Once more than
+    max_resident tiles are in memory, the least recently used are written to a
+    memory-mapped scratch file and reloaded on access, so memory stays at
+    about max_resident * TILE * TILE * 4 bytes (64 MiB by default), plus up
+    to MIP_BYTES for zoomed-out views, however large the document is. The scratch file is sparse and holds at most 3
+    bytes a pixel for tiles that have been paged out.
+
+    Drawing methods take document coordinates and only visit the tiles under
+    the shape's bounding box. The Surface-like methods (get_rect, fill, blit)
+    let history.History work on a TiledCanvas. A canvas opened with
+    paintfile.load() decodes its tiles from the file the first time they are
+    used.
+    """
+
+    def __init__(self, width, height, background=(255, 255, 255), tile=TILE,
+                 max_resident=RESIDENT_TILES):
+        self.width = width
+        self.height = height
+        self.background = background
+        self.tile = tile
+        self.max_resident = max_resident
+        self.columns = -(-width // tile)
+        self.rows = -(-height // tile)
+        self.tiles = OrderedDict()  # (column, row) -> Surface, least recently used first
+        self.paged = set()  # tiles whose only copy is in the scratch file
+        self.scratch = None
+        self.scratch_file = None
+        self.stored = {}  # tiles still only in an opened file: key -> (offset, length)
+        self.store = None  # read-only mmap of that file
+        self.store_shared = False  # store belongs to the canvas this one was copied from
+        self.saving = None  # paintfile.Saver copying tiles before they change
+        self.damage = None  # rects changed since take_damage(), if tracking
+        self.mips = OrderedDict()  # key -> {zoom: shrunk tile}, least recently used first
+        self.edits = {}  # key -> times the tile was opened for drawing or freed, see edits_in()
+        self.mip_bytes = 0
+        self.page_ins = 0
+        self.page_outs = 0
+
+    # Surface-like interface
+
+    def get_width(self):
+        return self.width
+
+    def get_height(self):
+        return self.height
+
+    def get_size(self):
+        return (self.width, self.height)
+
+    def get_rect(self):
+        return pygame.Rect(0, 0, self.width, self.height)
+
+    # Tile storage
+
+    def tile_rect(self, key):
+        """Document rect covered by a tile (clipped at the right and bottom edges)"""
+        column, row = key
+        return pygame.Rect(column * self.tile, row * self.tile, self.tile, self.tile).clip(self.get_rect())
+
+    def tiles_in(self, rect):
+        """Keys of all tiles intersecting rect (document coordinates)"""
+        rect = pygame.Rect(rect).clip(self.get_rect())
+        if not rect:
+            return []
+        tile = self.tile
+        return [(column, row)
+                for row in range(rect.top // tile, (rect.bottom - 1) // tile + 1)
+                for column in range(rect.left // tile, (rect.right - 1) // tile + 1)]
+
+    def allocated(self, key):
+        return key in self.tiles or key in self.paged or key in self.stored
+
+    def keys(self):
+        """Keys of all allocated tiles"""
+        return set(self.tiles) | self.paged | set(self.stored)
+
+    def get_tile(self, key, create=False):
+        """Resident surface of a tile, paging it in; None if blank and create is False.
+
+        create=True means the caller is about to draw into the tile.
+        """
+        if create:
+            if self.saving is not None:
+                self.saving.preserve(key)
+            self._forget_mips(key)
+            self.edits[key] = self.edits.get(key, 0) + 1
+        surface = self.tiles.get(key)
+        if surface is not None:
+            self.tiles.move_to_end(key)
+            return surface
+        if key in self.paged:
+            surface = self._page_in(key)
+        elif key in self.stored:
+            surface = self._decode(key)
+            del self.stored[key]
+        elif create:
+            surface = pygame.Surface(self.tile_rect(key).size)
+            surface.fill(self.background)
+        else:
+            return None
+        self._insert(key, surface)
+        return surface
+
+    def _decode(self, key):
+        offset, length = self.stored[key]
+        data = zlib.decompress(self.store[offset:offset + length])
+        return _from_rgb(data, self.tile_rect(key).size)
+
+    def _peek(self, key):
+        """Surface of an allocated tile to read from, without making it resident"""
+        surface = self.tiles.get(key)
+        if surface is not None:
+            return surface
+        if key in self.stored:
+            return self._decode(key)
+        return _from_rgb(self.tile_bytes(key), self.tile_rect(key).size)
+
+    def edits_in(self, rect):
+        """Edit counts of the tiles under rect; a count changes whenever its tile may have"""
+        return {key: self.edits.get(key, 0) for key in self.tiles_in(rect)}
+
+    def _insert(self, key, surface):
+        self.tiles[key] = surface
+        if len(self.tiles) > self.max_resident:
+            self._page_out(*self.tiles.popitem(last=False))
+
+    def copy(self, rect=None):
+        """Independent canvas holding copies of the tiles under rect (all if None).
+
+        Meant as a snapshot for work on another thread: the copy shares no
+        surfaces with this canvas. Tiles of an opened file that were never
+        decoded stay compressed and are read from the same file, so this
+        canvas must stay open while the copy is used.
+        """
+        copy = TiledCanvas(self.width, self.height, self.background, self.tile, self.max_resident)
+        keys = self.keys() if rect is None else [key for key in self.tiles_in(rect) if self.allocated(key)]
+        for key in keys:
+            if key in self.stored:
+                copy.stored[key] = self.stored[key]
+            else:
+                surface = self.tiles.get(key)
+                if surface is None:
+                    surface = _from_rgb(self.tile_bytes(key), self.tile_rect(key).size)
+                else:
+                    surface = surface.copy()
+                copy._insert(key, surface)
+        if copy.stored:
+            copy.store = self.store
+            copy.store_shared = True
+        return copy
+
+    def _slot(self, key):
+        column, row = key
+        return (row * self.columns + column) * self.tile * self.tile * 3
+
+    def _page_out(self, key, surface):
+        if self.scratch is None:
+            # Sparse file: only the slots actually written take disk space
+            self.scratch_file = tempfile.TemporaryFile(prefix='paint-tiles-')
+            self.scratch_file.truncate(self.columns * self.rows * self.tile * self.tile * 3)
+            self.scratch = mmap.mmap(self.scratch_file.fileno(), 0)
+        data = pygame.image.tobytes(surface, 'RGB')
+        offset = self._slot(key)
+        self.scratch[offset:offset + len(data)] = data
+        self.paged.add(key)
+        self.page_outs += 1
+
+    def _page_in(self, key):
+        self.paged.discard(key)
+        size = self.tile_rect(key).size
+        self.page_ins += 1
+        return _from_rgb(self.tile_bytes(key), size)
+
+    def tile_bytes(self, key):
+        """RGB bytes of an allocated, not stored tile, without touching the LRU order"""
+        surface = self.tiles.get(key)
+        if surface is not None:
+            return pygame.image.tobytes(surface, 'RGB')
+        width, height = self.tile_rect(key).size
+        offset = self._slot(key)
+        return self.scratch[offset:offset + width * height * 3]
+
+    def _drop(self, key):
+        if self.saving is not None:
+            self.saving.preserve(key)
+        self._forget_mips(key)
+        self.edits[key] = self.edits.get(key, 0) + 1
+        self.tiles.pop(key, None)
+        self.paged.discard(key)
+        self.stored.pop(key, None)
+
+    def close(self):
+        """Release the scratch file and any opened file"""
+        if self.scratch is not None:
+            self.scratch.close()
+            self.scratch_file.close()
+            self.scratch = self.scratch_file = None
+        if self.store is not None:
+            if not self.store_shared:
+                self.store.close()
+            self.store = None
+            self.stored.clear()
+        self.mips.clear()
+        self.mip_bytes = 0
+
+    # Drawing
+
+    def track_damage(self):
+        """Start recording the rects that drawing changes, for take_damage()"""
+        self.damage = []
+
+    def take_damage(self):
+        """Rects changed since the last call (overlapping ones may be merged)"""
+        damage, self.damage = self.damage, []
+        return damage
+
+    def _damaged(self, rect):
+        damage = self.damage
+        if damage is not None and rect:
+            if len(damage) >= MAX_DAMAGE:
+                damage[:] = [rect.unionall(damage)]
+            else:
+                damage.append(rect)
+        return rect
+
+    def draw(self, bounds, color, draw):
+        """Rasterize a shape with draw(surface, dx, dy) and copy it into the tiles it covers.
+
+        dx, dy translate document coordinates into surface coordinates; bounds
+        must contain the whole shape. The shape is drawn once on a temporary
+        surface spanning its bounds (clipped to the document), so the pixels
+        match drawing on one big surface, with no seams where tiles meet, and
+        only tiles that receive pixels get allocated. Shapes whose bounds
+        exceed SCRATCH_LIMIT pixels are drawn tile by tile instead, which can
+        shift pixels by one along tile edges. Returns the changed rect.
+        """
+        bounds = pygame.Rect(bounds).clip(self.get_rect())
+        if bounds.width * bounds.height > SCRATCH_LIMIT:
+            return self._damaged(self._draw_per_tile(bounds, draw))
+        color = pygame.Color(color)
+        key_color = (color.r ^ 1, color.g, color.b)
+        layer = pygame.Surface(bounds.size)
+        layer.fill(key_color)
+        changed = draw(layer, -bounds.x, -bounds.y).move(bounds.topleft)
+        if not changed:
+            return changed
+        layer.set_colorkey(key_color)
+        mask = None
+        for key in self.tiles_in(changed):
+            origin = self.tile_rect(key)
+            if not self.allocated(key):
+                # Skip blank tiles the shape's bounds cross without drawing into
+                if mask is None:
+                    mask = pygame.mask.from_surface(layer)
+                part = origin.clip(changed).move(-bounds.x, -bounds.y)
+                if not mask.overlap(pygame.mask.Mask(part.size, fill=True), part.topleft):
+                    continue
+            self.get_tile(key, create=True).blit(layer, (bounds.x - origin.x, bounds.y - origin.y))
+        return self._damaged(changed)
+
+    def _draw_per_tile(self, bounds, draw):
+        changed = None
+        for key in self.tiles_in(bounds):
+            created = not self.allocated(key)
+            surface = self.get_tile(key, create=True)
+            origin = self.tile_rect(key)
+            rect = draw(surface, -origin.x, -origin.y)
+            if rect:
+                rect = rect.move(origin.topleft)
+                changed = changed.union(rect) if changed else rect
+            elif created:
+                self._drop(key)
+        return changed or pygame.Rect(bounds.topleft, (0, 0))
+
+    def line(self, color, start, end, width=1):
+        """pygame.draw.line in document coordinates"""
+        bounds = pygame.Rect(min(start[0], end[0]), min(start[1], end[1]),
+                             abs(start[0] - end[0]) + 1, abs(start[1] - end[1]) + 1).inflate(width + 2, width + 2)
+        return self.draw(bounds, color, lambda surface, dx, dy: pygame.draw.line(
+            surface, color, (start[0] + dx, start[1] + dy), (end[0] + dx, end[1] + dy), width))
+
+    def circle(self, color, center, radius, width=0):
+        """pygame.draw.circle in document coordinates"""
+        bounds = (center[0] - radius - 1, center[1] - radius - 1, 2 * radius + 3, 2 * radius + 3)
+        return self.draw(bounds, color, lambda surface, dx, dy: pygame.draw.circle(
+            surface, color, (center[0] + dx, center[1] + dy), radius, width))
+
+    def rect(self, color, rect, width=0):
+        """pygame.draw.rect in document coordinates"""
+        rect = pygame.Rect(rect)
+        return self.draw(rect.inflate(2, 2), color, lambda surface, dx, dy: pygame.draw.rect(
+            surface, color, rect.move(dx, dy), width))
+
+    def fill(self, color, rect=None):
+        """Fill rect (the whole document if None); blank tiles are freed rather than painted"""
+        rect = self.get_rect() if rect is None else pygame.Rect(rect).clip(self.get_rect())
+        color = tuple(pygame.Color(color))[:3]
+        for key in self.tiles_in(rect):
+            origin = self.tile_rect(key)
+            if rect.contains(origin) and color == tuple(self.background):
+                self._drop(key)
+            elif self.allocated(key) or color != tuple(self.background):
+                self.get_tile(key, create=True).fill(color, rect.clip(origin).move(-origin.x, -origin.y))
+        return self._damaged(rect)
+
+    def blit(self, source, dest, area=None):
+        """Copy a surface into the document at dest"""
+        if area is not None:
+            source = source.subsurface(area)
+        bounds = pygame.Rect(dest[0], dest[1], *source.get_size())
+        return self._damaged(self._draw_per_tile(
+            bounds, lambda surface, dx, dy: surface.blit(source, (bounds.x + dx, bounds.y + dy))))
+
+    def is_blank(self, rect):
+        """True if no tile under rect has been allocated"""
+        return not any(self.allocated(key) for key in self.tiles_in(rect))
+
+    def read(self, rect):
+        """Copy of the document pixels under rect as a new surface"""
+        rect = pygame.Rect(rect)
+        surface = pygame.Surface(rect.size)
+        surface.fill(self.background)
+        for key in self.tiles_in(rect):
+            tile = self.get_tile(key)
+            if tile is not None:
+                origin = self.tile_rect(key)
+                part = origin.clip(rect)
+                surface.blit(tile, (part.x - rect.x, part.y - rect.y), part.move(-origin.x, -origin.y))
+        return surface
+
+    def strips(self):
+        """Yield the document top to bottom as full-width surfaces one tile row high"""
+        for row in range(self.rows):
+            yield self.read((0, row * self.tile, self.width, min(self.tile, self.height - row * self.tile)))
+
+    # Display
+
+    def render(self, surface, view, area=None):
+        """Composite the part of the document visible through view into surface.
+
+        Only tiles inside the view are visited; blank ones are left as the
+        background fill. area limits the work to part of the surface. Zoomed
+        out, tiles are shown from shrunk copies (see _mip) rather than
+        rescaled and paged in every frame.
+        """
+        area = surface.get_rect() if area is None else pygame.Rect(area).clip(surface.get_rect())
+        if not area:
+            return area
+        surface.fill(OUTSIDE, area)
+        zoom = view.zoom
+        visible = view.to_document_rect(area).clip(self.get_rect())
+        if not visible:
+            return area
+        page = view.to_screen_rect(visible).clip(area)
+        surface.fill(self.background, page)
+        clip = surface.get_clip()
+        surface.set_clip(area)
+        for key in self.tiles_in(visible):
+            if not self.allocated(key):
+                continue
+            origin = self.tile_rect(key)
+            part = origin.clip(visible)
+            source = part.move(-origin.x, -origin.y)
+            target = view.to_screen_rect(part)
+            if not target:
+                continue
+            if zoom == 1:
+                surface.blit(self.get_tile(key), target, source)
+            elif zoom < 1:
+                corner = (math.floor(source.x * zoom), math.floor(source.y * zoom))
+                surface.blit(self._mip(key, zoom), target, (corner, target.size))
+            else:
+                surface.blit(pygame.transform.scale(self.get_tile(key).subsurface(source), target.size), target)
+        surface.set_clip(clip)
+        return area
+
+    def _mip(self, key, zoom):
+        """An allocated tile shrunk by zoom (< 1), kept until the tile changes.
+
+        The tile is read with _peek(), so building mips for a zoomed-out view
+        does not push the tiles being drawn on out of memory. The least
+        recently shown mips are dropped past MIP_BYTES.
+        """
+        levels = self.mips.get(key)
+        if levels is None:
+            levels = self.mips[key] = {}
+        else:
+            self.mips.move_to_end(key)
+        mip = levels.get(zoom)
+        if mip is None:
+            tile = self._peek(key)
+            size = (math.ceil(tile.get_width() * zoom), math.ceil(tile.get_height() * zoom))
+            mip = levels[zoom] = pygame.transform.smoothscale(tile, size)
+            self.mip_bytes += _surface_bytes(mip)
+            while self.mip_bytes > MIP_BYTES and len(self.mips) > 1:
+                self._forget_mips(next(iter(self.mips)))
+        return mip
+
+    def _forget_mips(self, key):
+        levels = self.mips.pop(key, None)
+        if levels:
+            self.mip_bytes -= sum(_surface_bytes(mip) for mip in levels.values())
+
+    def stats(self):
+        return {
+            'tiles': self.columns * self.rows,
+            'resident': len(self.tiles),
+            'paged': len(self.paged),
+            'stored': len(self.stored),
+            'page_ins': self.page_ins,
+            'page_outs': self.page_outs,
+            'mip_bytes': self.mip_bytes,
+        }
+
+
+def _from_rgb(data, size):
+    """Tile surface from RGB bytes, in the same pixel format as a newly created tile"""
+    # frombytes gives a 24-bit surface, which surfarray.pixels2d cannot map
+    surface = pygame.Surface(size)
+    surface.blit(pygame.image.frombytes(data, size, 'RGB'), (0, 0))
+    return surface
+
+
+def _surface_bytes(surface):
+    return surface.get_width() * surface.get_height() * surface.get_bytesize()
+
+
+class Viewport:
+    """Pan/zoom mapping between screen and document coordinates.
+
+    Screen point p shows document point offset + p / zoom.
+    """
+
+    def __init__(self, offset=(0, 0), zoom=1):
+        self.offset = offset
+        self.zoom = zoom
+
+    def to_document(self, pos):
+        return (math.floor(self.offset[0] + pos[0] / self.zoom),
+                math.floor(self.offset[1] + pos[1] / self.zoom))
+
+    def to_screen(self, pos):
+        return (math.floor((pos[0] - self.offset[0]) * self.zoom),
+                math.floor((pos[1] - self.offset[1]) * self.zoom))
+
+    def to_document_rect(self, rect):
+        """Smallest document rect covering a screen rect"""
+        left, top = self.to_document(rect.topleft)
+        right = math.ceil(self.offset[0] + rect.right / self.zoom)
+        bottom = math.ceil(self.offset[1] + rect.bottom / self.zoom)
+        return pygame.Rect(left, top, right - left, bottom - top)
+
+    def to_screen_rect(self, rect):
+        """Screen rect of a document rect (edges rounded so neighbours do not gap)"""
+        left, top = self.to_screen(rect.topleft)
+        right, bottom = self.to_screen(rect.bottomright)
+        return pygame.Rect(left, top, right - left, bottom - top)
+
+    def pan(self, dx, dy):
+        """Scroll by a screen distance"""
+        self.offset = (self.offset[0] + dx / self.zoom, self.offset[1] + dy / self.zoom)
+
+    def zoom_by(self, steps, anchor):
+        """Move steps along ZOOM_LEVELS keeping the document point under anchor fixed"""
+        index = min(range(len(ZOOM_LEVELS)), key=lambda i: abs(ZOOM_LEVELS[i] - self.zoom))
+        zoom = ZOOM_LEVELS[min(max(index + steps, 0), len(ZOOM_LEVELS) - 1)]
+        x = self.offset[0] + anchor[0] / self.zoom
+        y = self.offset[1] + anchor[1] / self.zoom
+        self.zoom = zoom
+        self.offset = (x - anchor[0] / zoom, y - anchor[1] / zoom)